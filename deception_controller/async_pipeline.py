@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Staged asyncio pipeline for the deception controller
+
+    ingest -> [events] -> policy -> [placements] -> N placement workers -> [audit] -> audit
+
+- Stages are connected by bounded queues, so a slow stage applies backpressure
+  instead of growing memory
+- Blocking work (log reads, Ansible/SFTP placement) runs in worker threads, so a
+  slow host only occupies its own worker while ingestion and policy keep going
+- The pipeline is wired with plain callables from deception_controller.py
+- Checkpoints are taken between scans, once every event read so far has been
+  placed and audited (all queues joined), so the saved read positions never
+  run ahead of the work done
+"""
+
+import asyncio
+import logging
+import itertools
+from datetime import datetime
+
+INGEST_CHUNK = 1000  # events read per thread hop
+
+
+def take(iterator, n):
+    return list(itertools.islice(iterator, n))
+
+
+class AsyncPipeline:
+    """
+    - scan(flush=False): iterator of new Cowrie events; flush also releases events
+      held back for merging several sensors
+    - handle(event): (target, (token_name, token_content, audit)) or None
+    - place(target, [(token_name, token_content)]): blocking placement
+    - audit(entries): append the audit records of one placement batch
+    - flush_audit(): optional; called whenever the audit queue drains (group commit)
+    - wait(): block until new log data may be available
+    - checkpoint: optional Checkpointer (due() and a blocking save())
+    """
+
+    def __init__(self, scan, handle, place, audit, wait, flush_audit=None,
+                 workers=4, queue_size=1000, max_batch=50, checkpoint=None):
+        self.scan = scan
+        self.handle = handle
+        self.place = place
+        self.audit = audit
+        self.flush_audit = flush_audit
+        self.wait = wait
+        self.workers = max(1, workers)
+        self.queue_size = queue_size
+        self.max_batch = max(1, max_batch)
+        self.checkpoint = checkpoint
+
+    def depth(self):
+        """Items waiting across all stage queues."""
+        queues = [getattr(self, name, None) for name in ('events', 'placements', 'audits')]
+        return sum(q.qsize() for q in queues if q is not None)
+
+    async def run(self):
+        self.events = asyncio.Queue(self.queue_size)
+        self.placements = asyncio.Queue(self.queue_size)
+        self.audits = asyncio.Queue(self.queue_size)
+        tasks = [asyncio.create_task(self.ingest(), name='ingest'),
+                 asyncio.create_task(self.policy(), name='policy'),
+                 asyncio.create_task(self.audit_writer(), name='audit')]
+        tasks += [asyncio.create_task(self.placement_worker(i), name=f'placement-{i}')
+                  for i in range(self.workers)]
+        try:
+            # a stage only returns by raising; surface the first failure
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+            for task in done:
+                task.result()
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def ingest(self):
+        while True:
+            due = self.checkpoint is not None and self.checkpoint.due()
+            events = self.scan(flush=True) if due else self.scan()
+            while True:
+                chunk = await asyncio.to_thread(take, events, INGEST_CHUNK)
+                if not chunk:
+                    break
+                for event in chunk:
+                    await self.events.put(event)
+            if due:
+                await self.settle()
+                await asyncio.to_thread(self.checkpoint.save)
+            await asyncio.to_thread(self.wait)
+
+    async def settle(self):
+        """Wait until every event handed to the pipeline has been placed and audited."""
+        await self.events.join()
+        await self.placements.join()
+        await self.audits.join()
+
+    async def policy(self):
+        while True:
+            event = await self.events.get()
+            try:
+                placement = self.handle(event)
+                if placement is not None:
+                    await self.placements.put(placement)
+            except Exception as e:
+                logging.exception('Policy failed for event %s: %s', event.get('eventid'), e)
+            finally:
+                self.events.task_done()
+
+    async def placement_worker(self, worker_id):
+        while True:
+            batch = [await self.placements.get()]
+            # take whatever else is already queued, up to one batch
+            while len(batch) < self.max_batch and not self.placements.empty():
+                batch.append(self.placements.get_nowait())
+            by_target = {}
+            for target, item in batch:
+                by_target.setdefault(target, []).append(item)
+            try:
+                for target, items in by_target.items():
+                    try:
+                        await asyncio.to_thread(
+                            self.place, target, [(name, content) for name, content, _ in items])
+                    except Exception as e:
+                        logging.exception('Worker %d: placement on %s failed: %s', worker_id, target, e)
+                        continue
+                    placed_at = datetime.utcnow().isoformat() + "Z"
+                    await self.audits.put([{"timestamp": placed_at, **audit} for _, _, audit in items])
+            finally:
+                for _ in batch:
+                    self.placements.task_done()
+
+    async def audit_writer(self):
+        while True:
+            entries = await self.audits.get()
+            try:
+                self.audit(entries)
+                if self.flush_audit is not None and self.audits.empty():
+                    self.flush_audit()
+            except Exception as e:
+                logging.exception('Audit write failed: %s', e)
+            finally:
+                self.audits.task_done()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Group-commit writer for the controller audit log
+- Keeps the audit file open and buffers records in memory
+- Flushes a batch when it reaches max_records or max_bytes, or when the oldest
+  buffered record is older than max_delay seconds
+- fsync policy: 'none' (leave it to the OS), 'batch' (once per flush) or
+  'record' (every record is flushed and synced before write() returns)
+"""
+
+import os
+import json
+import time
+import threading
+
+FSYNC_POLICIES = ('none', 'batch', 'record')
+
+
+class AuditWriter:
+
+    def __init__(self, path, max_records=256, max_bytes=1024 * 1024, max_delay=1.0,
+                 fsync='batch', clock=time.monotonic):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"Unknown audit fsync policy: {fsync}")
+        self.path = path
+        self.max_records = max(1, max_records)
+        self.max_bytes = max_bytes
+        self.max_delay = max_delay
+        self.fsync = fsync
+        self.clock = clock
+        self.fh = None
+        self.buffer = []
+        self.buffered_bytes = 0
+        self.oldest = None
+        self.lock = threading.Lock()
+        self.records = 0
+        self.flushes = 0
+
+    def open(self):
+        if self.fh is None:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            self.fh = open(self.path, 'ab')
+        return self.fh
+
+    def write(self, entry):
+        line = (json.dumps(entry) + '\n').encode('utf-8')
+        with self.lock:
+            if not self.buffer:
+                self.oldest = self.clock()
+            self.buffer.append(line)
+            self.buffered_bytes += len(line)
+            self.records += 1
+            if (self.fsync == 'record' or len(self.buffer) >= self.max_records
+                    or self.buffered_bytes >= self.max_bytes):
+                self._flush()
+
+    def timeout(self, default):
+        """Seconds until the buffered batch must be flushed, capped at default."""
+        if self.oldest is None:
+            return default
+        return max(0.0, min(default, self.oldest + self.max_delay - self.clock()))
+
+    def flush_due(self):
+        with self.lock:
+            if self.oldest is not None and self.clock() - self.oldest >= self.max_delay:
+                self._flush()
+
+    def flush(self):
+        with self.lock:
+            self._flush()
+
+    def _flush(self):
+        if not self.buffer:
+            return
+        fh = self.open()
+        fh.write(b''.join(self.buffer))
+        fh.flush()
+        if self.fsync != 'none':
+            os.fsync(fh.fileno())
+        self.buffer = []
+        self.buffered_bytes = 0
+        self.oldest = None
+        self.flushes += 1
+
+    def close(self):
+        with self.lock:
+            self._flush()
+            if self.fh is not None:
+                self.fh.close()
+                self.fh = None
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Per-target batching of honeytoken placements
+- Placements are queued per Ansible target group
+- A group's batch is flushed when it reaches max_batch items or its oldest item
+  has waited max_delay seconds, so each flush is one bulk transfer
+"""
+
+import time
+import logging
+
+
+class PlacementBatcher:
+    """
+    Accumulate placements and hand them to flush_fn(target, items) in bulk.
+    - max_batch: flush a target as soon as this many items are queued (1 disables batching)
+    - max_delay: upper bound in seconds on how long an item waits for its batch
+    """
+
+    def __init__(self, flush_fn, max_batch=50, max_delay=1.0, clock=time.monotonic):
+        self.flush_fn = flush_fn
+        self.max_batch = max(1, max_batch)
+        self.max_delay = max_delay
+        self.clock = clock
+        self.pending = {}  # target -> list of items
+        self.opened = {}   # target -> time the first pending item was queued
+
+    def add(self, target, item):
+        items = self.pending.setdefault(target, [])
+        if not items:
+            self.opened[target] = self.clock()
+        items.append(item)
+        if len(items) >= self.max_batch:
+            self.flush_target(target)
+
+    def timeout(self, default):
+        """Seconds until the next batch falls due, capped at default."""
+        if not self.opened:
+            return default
+        due = min(self.opened.values()) + self.max_delay - self.clock()
+        return max(0.0, min(default, due))
+
+    def flush_due(self):
+        now = self.clock()
+        for target, opened in list(self.opened.items()):
+            if now - opened >= self.max_delay:
+                self.flush_target(target)
+
+    def flush(self):
+        for target in list(self.pending):
+            self.flush_target(target)
+
+    def flush_target(self, target):
+        items = self.pending.pop(target, [])
+        self.opened.pop(target, None)
+        if not items:
+            return
+        try:
+            self.flush_fn(target, items)
+        except Exception as e:
+            logging.exception('Flushing %d placements for %s failed: %s', len(items), target, e)
+
+    def __len__(self):
+        return sum(len(items) for items in self.pending.values())
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Durable controller checkpoints
+- Snapshot of log read positions, dedup store and rate-limit state
+- Written to a temp file, fsynced, then renamed over the previous checkpoint,
+  so a crash at any point leaves either the old or the new checkpoint intact
+- Loaded at startup so the controller resumes instead of replaying history
+"""
+
+import os
+import time
+import pickle
+import logging
+
+CHECKPOINT_VERSION = 1
+
+
+def save_checkpoint(path, state):
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as fh:
+        pickle.dump({"version": CHECKPOINT_VERSION, "saved_at": time.time(), **state}, fh,
+                    protocol=pickle.HIGHEST_PROTOCOL)
+        fh.flush()
+        os.fsync(fh.fileno())
+    os.replace(tmp, path)
+    # make the rename itself durable
+    dir_fd = os.open(os.path.dirname(path) or '.', os.O_RDONLY)
+    try:
+        os.fsync(dir_fd)
+    finally:
+        os.close(dir_fd)
+
+
+def load_checkpoint(path):
+    """Return the saved state dict, or None if there is no usable checkpoint."""
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'rb') as fh:
+            state = pickle.load(fh)
+    except Exception as e:
+        logging.warning('Ignoring unreadable checkpoint %s: %s', path, e)
+        return None
+    if not isinstance(state, dict) or state.get('version') != CHECKPOINT_VERSION:
+        logging.warning('Ignoring checkpoint %s with unsupported version', path)
+        return None
+    return state
+
+
+class Checkpointer:
+    """
+    Periodic checkpoints.
+    - collect(): returns the state dict to save
+    - interval: seconds between checkpoints (0 disables periodic saves)
+    """
+
+    def __init__(self, path, collect, interval=30, clock=time.monotonic):
+        self.path = path
+        self.collect = collect
+        self.interval = interval
+        self.clock = clock
+        self.last = clock()
+
+    def timeout(self, default):
+        if not self.interval:
+            return default
+        return max(0.0, min(default, self.last + self.interval - self.clock()))
+
+    def due(self):
+        return bool(self.interval) and self.clock() - self.last >= self.interval
+
+    def save(self):
+        start = time.perf_counter()
+        try:
+            save_checkpoint(self.path, self.collect())
+        except Exception as e:
+            logging.exception('Checkpoint to %s failed: %s', self.path, e)
+            return
+        finally:
+            self.last = self.clock()
+        logging.debug('Checkpoint written in %.1f ms', (time.perf_counter() - start) * 1000)
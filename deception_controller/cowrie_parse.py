@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Fast-path parsing of Cowrie JSON lines, shared by the controller and scoring
+- Uses orjson when it is installed, the standard json module otherwise
+- Optional byte-level eventid prefilter: lines whose eventid is not wanted are
+  skipped without being decoded
+- Optional field projection: only the fields a consumer reads are kept
+- Optional compact records (CowrieEvent) for consumers that hold many events in
+  memory and only need eventid, src_ip, timestamp and session
+"""
+
+import re
+import sys
+import json
+import socket
+from datetime import datetime
+
+try:
+    import orjson
+    loads = orjson.loads
+except ImportError:  # optional speed-up
+    orjson = None
+    loads = json.loads
+
+EVENTID_KEY = b'"eventid":"'
+# Eventids the controller reacts to unless DECEPTION_EVENTIDS says otherwise, and the
+# fields it always reads (the controller adds those its placement policy reads)
+CONTROLLER_EVENTIDS = ("cowrie.session.connect", "cowrie.login.success", "cowrie.login.failed",
+                       "cowrie.command.input", "cowrie.session.file_download", "cowrie.session.file_upload")
+CONTROLLER_FIELDS = ("eventid", "src_ip", "session", "timestamp", "username", "message",
+                     "input", "url", "outfile", "destfile")
+SRC_CACHE_SIZE = 65536  # distinct src_ip strings whose packed form is shared between records
+# Cowrie writes compact JSON; the regex covers hand-edited or re-serialized logs
+EVENTID_RE = re.compile(rb'"eventid"\s*:\s*"([^"\\]*)"')
+
+
+def line_eventid(line):
+    """Extract the eventid value from a raw JSON line without decoding it."""
+    i = line.find(EVENTID_KEY)
+    if i >= 0:
+        start = i + len(EVENTID_KEY)
+        return line[start:line.find(b'"', start)]
+    m = EVENTID_RE.search(line)
+    return m.group(1) if m else None
+
+
+def event_epoch(timestamp):
+    """Cowrie ISO-8601 timestamp (or epoch number) to epoch seconds; None if unparseable."""
+    if isinstance(timestamp, (int, float)):
+        return float(timestamp)
+    try:
+        if timestamp.endswith('Z'):
+            timestamp = timestamp[:-1] + '+00:00'
+        return datetime.fromisoformat(timestamp).timestamp()
+    except (AttributeError, ValueError):
+        return None
+
+
+def pack_ip(src_ip):
+    """src_ip as 4 (IPv4) or 16 (IPv6) packed bytes; the string itself if it is not an address."""
+    try:
+        return socket.inet_pton(socket.AF_INET6 if ':' in src_ip else socket.AF_INET, src_ip)
+    except (OSError, TypeError):
+        return src_ip
+
+
+class CowrieEvent:
+    """
+    Compact record of the fields scoring and replay key on:
+    - eventid: interned, so every record of one eventid shares a single string
+    - src: src_ip packed to 4/16 bytes (shared between records of one parser),
+      or the raw value if it is not an IP address
+    - ts: epoch seconds, None if the timestamp is missing or unparseable
+    - session: Cowrie session id (interned: a session's events share it)
+    get() mirrors dict.get for the original field names, so code written for
+    event dicts reads records unchanged; 'timestamp' comes back as epoch seconds.
+    """
+
+    __slots__ = ('eventid', 'src', 'ts', 'session')
+    FIELDS = ('eventid', 'src_ip', 'timestamp', 'session')
+
+    def __init__(self, eventid, src, ts, session):
+        self.eventid = eventid
+        self.src = src
+        self.ts = ts
+        self.session = session
+
+    @classmethod
+    def from_event(cls, event, src_cache=None):
+        eventid = event.get('eventid')
+        session = event.get('session')
+        src_ip = event.get('src_ip')
+        if src_cache is None:
+            src = pack_ip(src_ip) if src_ip is not None else None
+        else:
+            src = src_cache.get(src_ip)
+            if src is None and src_ip is not None:
+                if len(src_cache) >= SRC_CACHE_SIZE:
+                    src_cache.clear()
+                src = src_cache[src_ip] = pack_ip(src_ip)
+        return cls(sys.intern(eventid) if isinstance(eventid, str) else eventid,
+                   src,
+                   event_epoch(event.get('timestamp')),
+                   sys.intern(session) if isinstance(session, str) else session)
+
+    @property
+    def src_ip(self):
+        src = self.src
+        if isinstance(src, bytes):
+            return socket.inet_ntop(socket.AF_INET if len(src) == 4 else socket.AF_INET6, src)
+        return src
+
+    def get(self, key, default=None):
+        if key == 'eventid':
+            value = self.eventid
+        elif key == 'src_ip':
+            value = self.src_ip
+        elif key == 'timestamp':
+            value = self.ts
+        elif key == 'session':
+            value = self.session
+        else:
+            return default
+        return default if value is None else value
+
+    def to_dict(self):
+        return {key: value for key in self.FIELDS if (value := self.get(key)) is not None}
+
+    def __repr__(self):
+        return f'CowrieEvent({self.eventid!r}, {self.src_ip!r}, {self.ts!r}, {self.session!r})'
+
+
+class EventParser:
+    """
+    Callable turning one raw log line (bytes) into an event dict, or None.
+    - eventids: iterable of eventid strings to keep (None keeps every event)
+    - fields: iterable of field names to keep (None keeps every field)
+    - compact: return CowrieEvent records instead of dicts (fields is then ignored)
+    Counters: parsed, filtered (skipped by the prefilter), errors (undecodable lines).
+    """
+
+    def __init__(self, eventids=None, fields=None, compact=False):
+        self.eventids = frozenset(e.encode('utf-8') for e in eventids) if eventids else None
+        self.fields = tuple(fields) if fields else None
+        self.compact = compact
+        self.src_cache = {}
+        self.parsed = 0
+        self.filtered = 0
+        self.errors = 0
+
+    def __call__(self, line):
+        if self.eventids is not None and line_eventid(line) not in self.eventids:
+            self.filtered += 1
+            return None
+        try:
+            event = loads(line)
+        except ValueError:
+            if line.strip():
+                self.errors += 1
+            return None
+        if not isinstance(event, dict):
+            self.errors += 1
+            return None
+        self.parsed += 1
+        if self.compact:
+            return CowrieEvent.from_event(event, self.src_cache)
+        if self.fields is not None:
+            return {k: event[k] for k in self.fields if k in event}
+        return event
+
+
+def parse_file(path, parser):
+    """Yield parsed events from every complete line of a Cowrie JSON file."""
+    with open(path, 'rb') as fh:
+        for line in fh:
+            event = parser(line)
+            if event is not None:
+                yield event
@@ -1,7 +1,8 @@
 #!/usr/bin/env python3
 """
 Adaptive Deception Controller (skeleton)
-- Watches Cowrie log directory (or Elasticsearch) for attacker events
+- Watches Cowrie log directories (or Elasticsearch) for attacker events; several
+  sensors are merged into one stream ordered by event timestamp
 - Deploys or rotates honeytokens on lab hosts via Ansible
 - Publishes a short audit log for scoring pipelines
 
@@ -14,119 +15,896 @@ IMPORTANT: Run only in an isolated lab environment. Do not place real credential
 
 import os
 import time
-import json
+import sys
+import atexit
+import argparse
+import signal
+import secrets
+import asyncio
 import logging
-import subprocess
 from datetime import datetime
+from contextlib import nullcontext
+
+from async_pipeline import AsyncPipeline
+from audit_writer import AuditWriter
+from batching import PlacementBatcher
+from checkpoint import Checkpointer, load_checkpoint
+import cowrie_parse
+from cowrie_parse import EventParser, event_epoch
+from dedup import event_key, make_dedup
+from log_segments import discover_segments, stream_lines
+from log_tail import LogTailer
+from es_source import ElasticsearchSource
+from lifecycle import TokenLifecycle
+from log_watch import PollWatcher, make_watcher
+from merge import ReorderBuffer
+from metrics import Registry, serve
+from placement import make_backend
+from policy import Policy, load_policy
+from profiling import LoopProfiler
+from rate_limit import PlacementLimiter
+from replay import ReplayClock, StageStats, paced, peak_rss_mb
+from routing import RoutingTable
+from sharded import CHECKPOINT, ShardedController
+from shedding import LoadShedder, parse_priorities
+from ssh_pool import SSHPool
+from token_match import TokenMatcher
+from token_registry import TokenRegistry
 
 # Configurable base directory (use env var DECEPTION_BASE to override)
 BASE_DIR = os.path.expanduser(os.environ.get("DECEPTION_BASE", "~/deception_lab"))
 COWRIE_LOG_DIR = os.path.join(BASE_DIR, "logs", "cowrie")
+# Log directories of every Cowrie sensor (os.pathsep- or comma-separated); with more
+# than one, their events are merged into one stream ordered by Cowrie timestamp
+COWRIE_LOG_DIRS = [os.path.normpath(os.path.expanduser(d)) for d in os.environ.get(
+    "DECEPTION_COWRIE_LOG_DIRS", COWRIE_LOG_DIR).replace(",", os.pathsep).split(os.pathsep) if d]
+# Multi-sensor merge: longest time (seconds) an event is held back for reordering,
+# and the most events held at once
+REORDER_WINDOW = float(os.environ.get("DECEPTION_REORDER_WINDOW", "2.0"))
+REORDER_MAX_EVENTS = int(os.environ.get("DECEPTION_REORDER_MAX_EVENTS", "100000"))
 HONEYTOKEN_DIR = os.path.join(BASE_DIR, "honeytokens")
 AUDIT_LOG = os.path.join(BASE_DIR, "logs", "deception_controller_audit.log")
+# SQLite (WAL) registry of placed tokens, queried by scoring and analysis
+TOKEN_DB = os.environ.get("DECEPTION_TOKEN_DB", os.path.join(BASE_DIR, "logs", "token_registry.sqlite3"))
 CHECK_INTERVAL = int(os.environ.get("DECEPTION_CHECK_INTERVAL", "5"))  # seconds
+# Cowrie events the controller reacts to ('*' for all) and the fields it reads
+EVENTIDS = os.environ.get("DECEPTION_EVENTIDS", ",".join(cowrie_parse.CONTROLLER_EVENTIDS))
+CONTROLLER_EVENTIDS = None if EVENTIDS == "*" else EVENTIDS.split(",")
+CONTROLLER_FIELDS = cowrie_parse.CONTROLLER_FIELDS
+# Fields searched for live token names, per eventid
+TOKEN_ACCESS_FIELDS = {
+    "cowrie.command.input": ("input",),
+    "cowrie.session.file_download": ("url", "outfile", "destfile"),
+}
+# Where events come from: 'files' (tail COWRIE_LOG_DIRS) or 'elasticsearch'
+EVENT_SOURCE = os.environ.get("DECEPTION_SOURCE", "files")
+ES_URL = os.environ.get("DECEPTION_ES_URL", "http://localhost:9200")
+ES_INDEX = os.environ.get("DECEPTION_ES_INDEX", "cowrie-*")
+ES_PAGE_SIZE = int(os.environ.get("DECEPTION_ES_PAGE_SIZE", "500"))  # initial; tuned at runtime
+ES_CURSOR = os.path.join(BASE_DIR, "logs", "es_cursor.json")
+# 'auto' (inotify with polling fallback), 'inotify' or 'poll'
+WATCH_MODE = os.environ.get("DECEPTION_WATCH_MODE", "auto")
+# Dedup store for already-handled events: 'lru', 'window' or 'bloom'
+DEDUP_MODE = os.environ.get("DECEPTION_DEDUP_MODE", "lru")
+DEDUP_MAX_ENTRIES = int(os.environ.get("DECEPTION_DEDUP_MAX_ENTRIES", "1000000"))
+DEDUP_WINDOW = int(os.environ.get("DECEPTION_DEDUP_WINDOW", "3600"))  # seconds, window mode
+DEDUP_FP_RATE = float(os.environ.get("DECEPTION_DEDUP_FP_RATE", "0.001"))  # bloom mode
+# Token buckets limiting placements per attacker address and per Cowrie session
+RATE_LIMIT = os.environ.get("DECEPTION_RATE_LIMIT", "1") == "1"
+RATE_IP_BURST = float(os.environ.get("DECEPTION_RATE_IP_BURST", "3"))
+RATE_IP_REFILL = float(os.environ.get("DECEPTION_RATE_IP_REFILL", str(1 / 60)))  # tokens/sec
+RATE_SESSION_BURST = float(os.environ.get("DECEPTION_RATE_SESSION_BURST", "1"))
+RATE_SESSION_REFILL = float(os.environ.get("DECEPTION_RATE_SESSION_REFILL", "0"))  # tokens/sec
+# Audit records are group-committed: flushed per batch of records/bytes or after a delay
+AUDIT_BATCH = int(os.environ.get("DECEPTION_AUDIT_BATCH", "256"))  # records
+AUDIT_BATCH_BYTES = int(os.environ.get("DECEPTION_AUDIT_BATCH_BYTES", str(1024 * 1024)))
+AUDIT_FLUSH_INTERVAL = float(os.environ.get("DECEPTION_AUDIT_FLUSH_INTERVAL", "1.0"))  # seconds
+AUDIT_FSYNC = os.environ.get("DECEPTION_AUDIT_FSYNC", "batch")  # 'none', 'batch' or 'record'
+# 'loop' (single synchronous loop), 'async' (staged asyncio pipeline),
+# 'sharded' (one worker process per shard of src_ip) or 'replay' (benchmark
+# the loop pipeline against a recorded log, then exit)
+CONTROLLER_MODE = os.environ.get("DECEPTION_CONTROLLER_MODE", "loop")
+SHARDS = int(os.environ.get("DECEPTION_SHARDS", str(os.cpu_count() or 1)))  # sharded mode
+PLACEMENT_WORKERS = int(os.environ.get("DECEPTION_PLACEMENT_WORKERS", "4"))  # async mode
+QUEUE_SIZE = int(os.environ.get("DECEPTION_QUEUE_SIZE", "1000"))  # per-stage bound, async mode
+# Placements per target are pushed in one Ansible run per batch
+BATCH_MAX_SIZE = int(os.environ.get("DECEPTION_BATCH_MAX_SIZE", "50"))
+BATCH_MAX_DELAY = float(os.environ.get("DECEPTION_BATCH_MAX_DELAY", "1.0"))  # seconds
+REMOTE_TOKEN_DIR = "/opt/deception_lab/honeytokens"
+# Placement backend (see placement.py): 'ansible' runs ad-hoc ansible per batch; 'ssh'
+# writes over pooled SFTP sessions; 'local' writes into HONEYTOKEN_DIR on this host
+# (controller co-located with Cowrie); 'noop' only logs (replay default)
+TRANSPORT = os.environ.get("DECEPTION_TRANSPORT", "noop" if CONTROLLER_MODE == "replay" else "ansible")
+INVENTORY = os.environ.get("DECEPTION_INVENTORY", os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "ansible", "inventory.ini"))
+# CIDR -> target routes (optional file); unmatched sources go to DEFAULT_TARGET
+ROUTES_FILE = os.environ.get("DECEPTION_ROUTES", os.path.join(os.path.dirname(INVENTORY), "routes.txt"))
+DEFAULT_TARGET = os.environ.get("DECEPTION_DEFAULT_TARGET", "lab_hosts")
+# Placement rules (JSON or YAML, see policy.py); without the file every event places a token
+POLICY_FILE = os.environ.get("DECEPTION_POLICY", os.path.join(os.path.dirname(INVENTORY), "policy.json"))
+# Load shedding under event floods (see shedding.py): 'coalesce' (one placement per src_ip
+# per window), 'drop' (low-priority eventids), 'audit' (audit only, no placements) or 'off'.
+# Shedding starts when events reach the policy SHED_MAX_LAG seconds late or more than
+# SHED_MAX_DEPTH events/placements are queued (async mode), and ends at SHED_RESUME_LAG
+SHED_MODE = os.environ.get("DECEPTION_SHED_MODE", "coalesce")
+SHED_MAX_LAG = float(os.environ.get("DECEPTION_SHED_MAX_LAG", "60"))  # seconds
+SHED_RESUME_LAG = float(os.environ.get("DECEPTION_SHED_RESUME_LAG", "10"))  # seconds
+SHED_MAX_DEPTH = int(os.environ.get("DECEPTION_SHED_MAX_DEPTH", str(2 * QUEUE_SIZE)))
+SHED_PRIORITIES = parse_priorities(os.environ.get("DECEPTION_SHED_PRIORITIES", ""))  # eventid=n,...
+SHED_MIN_PRIORITY = int(os.environ.get("DECEPTION_SHED_MIN_PRIORITY", "2"))  # drop mode
+SHED_COALESCE_WINDOW = float(os.environ.get("DECEPTION_SHED_COALESCE_WINDOW", "300"))  # seconds
+SHED_HOLD = float(os.environ.get("DECEPTION_SHED_HOLD", "30"))  # minimum seconds per shedding episode
+# Token lifecycle: expire (and rotate) tokens after TOKEN_TTL seconds and keep at most
+# TOKEN_MAX_LIVE live tokens per host/target; 0 disables either rule
+TOKEN_TTL = float(os.environ.get("DECEPTION_TOKEN_TTL", str(7 * 86400)))  # seconds
+TOKEN_MAX_LIVE = int(os.environ.get("DECEPTION_TOKEN_MAX_LIVE", "1000"))  # per host/target
+TOKEN_ROTATE = os.environ.get("DECEPTION_TOKEN_ROTATE", "1") == "1"
+TOKEN_SWEEP_INTERVAL = float(os.environ.get("DECEPTION_TOKEN_SWEEP_INTERVAL", "60"))  # seconds
+# Durable resume state (loop mode); 0 disables periodic checkpoints
+CHECKPOINT_PATH = os.path.join(BASE_DIR, "logs", "controller_checkpoint.pickle")
+CHECKPOINT_INTERVAL = float(os.environ.get("DECEPTION_CHECKPOINT_INTERVAL", "30"))  # seconds
+# Replay mode: recorded log file (or directory of segments) and speed multiple (0 = as fast as possible)
+REPLAY_LOG = os.environ.get("DECEPTION_REPLAY_LOG", os.path.join(COWRIE_LOG_DIR, "cowrie.json"))
+REPLAY_SPEED = float(os.environ.get("DECEPTION_REPLAY_SPEED", "0"))
+REPLAY_AUDIT_LOG = os.path.join(BASE_DIR, "logs", "replay_audit.log")
+REPLAY_TOKEN_DB = os.path.join(BASE_DIR, "logs", "replay_token_registry.sqlite3")
+# Per-event logging dominates replay timings, so it is raised to this level while replaying
+REPLAY_LOG_LEVEL = os.environ.get("DECEPTION_REPLAY_LOG_LEVEL", "WARNING")
+# --profile dumps (cProfile + tracemalloc diffs)
+PROFILE_DIR = os.path.join(BASE_DIR, "logs", "profiles")
+# Serve Prometheus metrics on 127.0.0.1:<port>; 0 disables the endpoint
+METRICS_PORT = int(os.environ.get("DECEPTION_METRICS_PORT", "0"))
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
 
+def load_placement_policy():
+    """Compile POLICY_FILE, or the place-on-every-event policy if there is none."""
+    if not os.path.exists(POLICY_FILE):
+        logging.info('No policy file at %s; placing a token for every event', POLICY_FILE)
+        return Policy()
+    policy = load_policy(POLICY_FILE)
+    if CONTROLLER_EVENTIDS is not None:
+        unread = set(policy.table) - set(CONTROLLER_EVENTIDS)
+        if unread:
+            logging.warning('Policy rules name eventids not in DECEPTION_EVENTIDS (never read): %s',
+                            ', '.join(sorted(unread)))
+    return policy
+
+# Compiled once; the parser must keep every field a rule reads
+POLICY = load_placement_policy()
+CONTROLLER_FIELDS = tuple(dict.fromkeys(CONTROLLER_FIELDS + tuple(sorted(POLICY.fields()))))
+
+# Read positions for COWRIE_LOG_DIRS; kept for the life of the process.
+# Lines for other eventids are skipped before JSON decoding.
+LOG_TAILER = LogTailer(parser=EventParser(CONTROLLER_EVENTIDS, CONTROLLER_FIELDS))
+AUDIT_WRITER = AuditWriter(AUDIT_LOG, AUDIT_BATCH, AUDIT_BATCH_BYTES, AUDIT_FLUSH_INTERVAL,
+                           AUDIT_FSYNC)
+# Names of placed tokens, matched against attacker input; fed from record_audits
+TOKEN_MATCHER = TokenMatcher()
+# Events from several sensors waiting to be released in timestamp order
+REORDER_BUFFER = ReorderBuffer(REORDER_WINDOW, REORDER_MAX_EVENTS, COWRIE_LOG_DIRS)
+# Opened on first use by get_registry
+TOKEN_REGISTRY = None
+# Placement backend for TRANSPORT; created on first use
+PLACEMENT_BACKEND = None
+# Loaded on first use by map_srcip_to_target
+ROUTES = None
+
+METRICS = Registry()
+EVENTS_INGESTED = METRICS.counter(
+    'deception_events_ingested_total', 'Cowrie events read from the event source')
+PARSE_ERRORS = METRICS.counter(
+    'deception_parse_errors_total', 'Cowrie log lines that could not be decoded')
+PARSE_ERRORS.set_function(lambda: LOG_TAILER.parser.errors)
+DEDUP_HITS = METRICS.counter(
+    'deception_dedup_hits_total', 'Events skipped because they were already processed')
+QUEUE_DEPTH = METRICS.gauge(
+    'deception_queue_depth', 'Events and placements waiting inside the controller')
+INGEST_LAG = METRICS.gauge(
+    'deception_ingest_lag_seconds', 'Now minus the Cowrie timestamp of the latest ingested event')
+PLACEMENT_LATENCY = METRICS.histogram(
+    'deception_placement_seconds', 'Honeytoken placement latency per host or target group')
+PLACEMENT_FAILURES = METRICS.counter(
+    'deception_placement_failures_total', 'Failed Ansible runs or SFTP writes per host or target group')
+LIVE_TOKENS = METRICS.gauge(
+    'deception_live_tokens', 'Placed honeytokens whose names are watched for access')
+LIVE_TOKENS.set_function(lambda: len(TOKEN_MATCHER))
+TOKENS_TRIPPED = METRICS.counter(
+    'deception_tokens_tripped_total', 'Attacker commands or downloads that referenced a live honeytoken')
+TOKENS_RETIRED = METRICS.counter(
+    'deception_tokens_retired_total', 'Honeytokens removed by the lifecycle sweep, by reason')
+TOKENS_ROTATED = METRICS.counter(
+    'deception_tokens_rotated_total', 'Expired honeytokens replaced by fresh ones')
+REORDER_HELD = METRICS.gauge(
+    'deception_reorder_held_events', 'Events held back to merge several sensors in timestamp order')
+REORDER_HELD.set_function(lambda: len(REORDER_BUFFER))
+REORDER_LATE = METRICS.counter(
+    'deception_reorder_late_total', 'Merged events released after a later-stamped one (reorder window exceeded)')
+REORDER_LATE.set_function(lambda: REORDER_BUFFER.late)
+AUDIT_LATENCY = METRICS.histogram(
+    'deception_audit_write_seconds', 'Time spent buffering each audit record, including group-commit flushes',
+    buckets=(0.00001, 0.0001, 0.001, 0.01, 0.1, 1.0))
+POLICY_DECISIONS = METRICS.counter(
+    'deception_policy_decisions_total', 'Events by the policy rule that decided them')
+SHEDDING = METRICS.gauge(
+    'deception_shedding', '1 while the controller is overloaded and shedding load, else 0')
+EVENTS_SHED = METRICS.counter(
+    'deception_events_shed_total', 'Placements skipped while shedding load, by action (dropped/coalesced/audit_only)')
+RATE_LIMITED = METRICS.counter(
+    'deception_placements_rate_limited_total', 'Placements suppressed by the rate limit, by bucket (ip/session)')
+# incremented inside the shard workers in sharded mode; ingest adds up what each ack reports
+SHARD_COUNTERS = (DEDUP_HITS, POLICY_DECISIONS, EVENTS_SHED, RATE_LIMITED, PLACEMENT_FAILURES)
+
 def ensure_directories():
-    os.makedirs(COWRIE_LOG_DIR, exist_ok=True)
+    for log_dir in COWRIE_LOG_DIRS:
+        os.makedirs(log_dir, exist_ok=True)
     os.makedirs(HONEYTOKEN_DIR, exist_ok=True)
     os.makedirs(os.path.dirname(AUDIT_LOG), exist_ok=True)
 
-def scan_cowrie_logs(log_dir):
-    """Scan for new Cowrie JSON log files and yield parsed events."""
+def scan_cowrie_logs(log_dir, tailer=None):
+    """
+    Yield Cowrie events appended since the previous scan.
+    - tailer: LogTailer holding per-file read positions (defaults to the module-wide one)
+    """
     if not os.path.isdir(log_dir):
         logging.warning('Cowrie log dir does not exist: %s', log_dir)
         return
-    for fname in sorted(os.listdir(log_dir)):
-        if not fname.endswith('.json'):
+    yield from (tailer or LOG_TAILER).poll(log_dir)
+
+def scan_merged_logs(log_dirs, buffer, flush=False):
+    """
+    Yield events from several Cowrie log directories in timestamp order.
+    - buffer: ReorderBuffer; new events are held in it until no sensor can still
+      produce an earlier one, or for at most its window
+    - flush: release every held event too (their lines are already behind the read positions)
+    """
+    for log_dir in log_dirs:
+        for event in scan_cowrie_logs(log_dir):
+            if not buffer.push(log_dir, event):
+                yield event
+            elif len(buffer) > buffer.max_events:
+                yield from buffer.pop_ready()
+    yield from buffer.drain() if flush else buffer.pop_ready()
+
+def start_metrics():
+    if METRICS_PORT:
+        serve(METRICS, METRICS_PORT)
+        logging.info('Serving metrics on http://127.0.0.1:%d/metrics', METRICS_PORT)
+
+def observe_ingest(events):
+    """
+    Count events and track ingest lag as they pass from the source to the controller,
+    and check each one for honeytoken access.
+    """
+    for event in events:
+        EVENTS_INGESTED.inc()
+        ts = event_epoch(event.get('timestamp'))
+        if ts is not None:
+            INGEST_LAG.set(round(time.time() - ts, 3))
+        check_token_access(event)
+        yield event
+
+def check_token_access(event):
+    """
+    Audit a 'token_tripped' record for every live token named in a command line or download.
+    Each event trips a token at most once, however often it is re-read (restarts, replays).
+    """
+    fields = TOKEN_ACCESS_FIELDS.get(event.get('eventid'))
+    if fields is None:
+        return
+    for field in fields:
+        text = event.get(field)
+        if not isinstance(text, str):
             continue
-        path = os.path.join(log_dir, fname)
-        try:
-            with open(path, 'r') as fh:
-                for line in fh:
-                    try:
-                        event = json.loads(line.strip())
-                        yield event
-                    except json.JSONDecodeError:
-                        continue
-        except Exception as e:
-            logging.exception('Failed to read cowrie log %s: %s', path, e)
+        for token_name in sorted(TOKEN_MATCHER.find(text)):
+            src_ip = event.get('src_ip', 'unknown')
+            key = event_key(event.get('session') or '', event.get('src_ip') or 'unknown',
+                            event.get('timestamp') or '')
+            if not get_registry().record_trip(token_name, event_key=key):
+                continue
+            TOKENS_TRIPPED.inc()
+            logging.warning('Honeytoken %s tripped by %s (session %s): %s',
+                            token_name, src_ip, event.get('session'), text)
+            record_audit({
+                "timestamp": datetime.utcnow().isoformat() + "Z",
+                "action": "token_tripped",
+                "token": token_name,
+                "src_ip": src_ip,
+                "session": event.get('session', ''),
+                "eventid": event.get('eventid'),
+                "event_timestamp": event.get('timestamp'),
+                "reason": text
+            })
+
+def make_event_source():
+    """
+    Return (scan, watcher) for the configured EVENT_SOURCE.
+    - scan(flush=False): iterator of events that arrived since the previous call;
+      flush also releases events held back for merging several sensors
+    - watcher.wait(timeout): block until the next scan is worthwhile
+    """
+    if EVENT_SOURCE == 'elasticsearch':
+        source = ElasticsearchSource(ES_URL, ES_INDEX, cursor_path=ES_CURSOR,
+                                     page_size=ES_PAGE_SIZE, fields=CONTROLLER_FIELDS,
+                                     eventids=CONTROLLER_EVENTIDS)
+        return (lambda flush=False: observe_ingest(source.poll())), PollWatcher()
+    watcher = make_watcher(COWRIE_LOG_DIRS, WATCH_MODE)
+    if len(COWRIE_LOG_DIRS) == 1:
+        return (lambda flush=False: observe_ingest(scan_cowrie_logs(COWRIE_LOG_DIRS[0]))), watcher
+    logging.info('Merging %d Cowrie log directories (reorder window %gs)', len(COWRIE_LOG_DIRS), REORDER_WINDOW)
+    return (lambda flush=False: observe_ingest(scan_merged_logs(COWRIE_LOG_DIRS, REORDER_BUFFER, flush))), watcher
+
+def observe_placement(host, seconds, ok):
+    PLACEMENT_LATENCY.observe(seconds, host=host)
+    if not ok:
+        PLACEMENT_FAILURES.inc(host=host)
+
+def get_registry():
+    """Open TOKEN_DB and start watching the tokens it lists as live."""
+    global TOKEN_REGISTRY
+    if TOKEN_REGISTRY is None:
+        TOKEN_REGISTRY = TokenRegistry(TOKEN_DB)
+        TOKEN_MATCHER.add_many(TOKEN_REGISTRY.names('live'))
+        logging.info('Token registry %s: %d live tokens', TOKEN_DB, len(TOKEN_MATCHER))
+    return TOKEN_REGISTRY
+
+def get_backend():
+    global PLACEMENT_BACKEND
+    if PLACEMENT_BACKEND is None:
+        if TRANSPORT == 'local':
+            PLACEMENT_BACKEND = make_backend('local', HONEYTOKEN_DIR, observe_placement)
+        elif TRANSPORT == 'ssh':
+            PLACEMENT_BACKEND = make_backend('ssh', REMOTE_TOKEN_DIR, observe_placement,
+                                             pool_factory=lambda: SSHPool.from_inventory(INVENTORY))
+        else:
+            PLACEMENT_BACKEND = make_backend(TRANSPORT, REMOTE_TOKEN_DIR, observe_placement)
+    return PLACEMENT_BACKEND
 
 def place_honeytoken(target_group, token_content, token_name):
     """
-    Place a honeytoken file on target group via Ansible ad-hoc copy.
+    Place one honeytoken file on target group with the configured backend.
     - target_group: Ansible inventory host or group (e.g., 'host1', 'lab_hosts')
     - token_content: string to write
     - token_name: filename such as honey_12345.txt
     """
-    local_tmp = os.path.join("/tmp", token_name)
-    with open(local_tmp, 'w') as fh:
-        fh.write(token_content)
+    return place_honeytokens(target_group, [(token_name, token_content)])
 
-    cmd = ['ansible', target_group, '-m', 'copy', '-a',
-           f"src={local_tmp} dest=/opt/deception_lab/honeytokens/{token_name} mode=0644"]
-    logging.info('Placing honeytoken %s on %s', token_name, target_group)
-    try:
-        subprocess.run(cmd, check=True)
-    except subprocess.CalledProcessError as e:
-        logging.exception('Ansible copy failed: %s', e)
+def place_honeytokens(target_group, tokens):
+    """
+    Place several honeytokens on target group in one backend call.
+    - tokens: list of (token_name, token_content)
+    Returns the hosts/targets where placement failed.
+    """
+    return get_backend().place(target_group, tokens)
+
+def remove_honeytokens(target_group, token_names):
+    """Delete token files from target group in one backend call; returns the failed hosts."""
+    return get_backend().remove(target_group, token_names)
+
+def flush_placements(target_group, items):
+    """Batch flush: place queued tokens, then audit them with the placement time."""
+    place_honeytokens(target_group, [(name, content) for name, content, _ in items])
+    placed_at = datetime.utcnow().isoformat() + "Z"
+    record_audits([{"timestamp": placed_at, **audit} for _, _, audit in items])
 
 def record_audit(entry):
-    os.makedirs(os.path.dirname(AUDIT_LOG), exist_ok=True)
-    with open(AUDIT_LOG, 'a') as fh:
-        fh.write(json.dumps(entry) + '\n')
+    """Buffer one audit record; AUDIT_WRITER decides when it reaches disk."""
+    record_audits([entry])
 
-def map_srcip_to_target(src_ip):
+def record_audits(entries):
     """
-    Conservative default mapping:
-    - If lab hosts are NATed or static IPs, set mapping logic here.
-    - For now, return 'lab_hosts' (group) to place token on all lab hosts.
-    Customize for your inventory.
+    Buffer a batch of audit records. Tokens whose placement is among them are
+    registered in one registry transaction and watched for access.
     """
-    return "lab_hosts"
+    placed = []
+    for entry in entries:
+        with AUDIT_LATENCY.time():
+            AUDIT_WRITER.write(entry)
+        action = entry.get('action')
+        if action == 'place_honeytoken':
+            placed.append((entry['token'], entry.get('target'), entry.get('src_ip'), entry.get('session'),
+                           entry.get('username'), entry.get('reason'), None, entry.get('event_key')))
+        elif action == 'retire_honeytoken':
+            TOKENS_RETIRED.inc(reason=entry.get('reason'))
+        elif action == 'rotate_honeytoken':
+            TOKENS_ROTATED.inc()
+    if placed:
+        get_registry().add_many(placed)
+        TOKEN_MATCHER.add_many(row[0] for row in placed)
 
-def main_loop():
-    ensure_directories()
-    processed = set()
-    logging.info('Starting Deception Controller. Check interval: %s sec', CHECK_INTERVAL)
-    while True:
-        for event in scan_cowrie_logs(COWRIE_LOG_DIR):
-            # Use 'session' or 'src_ip' or 'username' fields to identify interactions
-            src_ip = event.get('src_ip') or event.get('src_ip', 'unknown')
-            session = event.get('session') or ''
-            timestamp = event.get('timestamp') or ''
-            event_id = f"{session}|{src_ip}|{timestamp}"
-            if event_id in processed:
-                continue
-            processed.add(event_id)
+def shutdown():
+    """Flush buffered audit records and close the placement backend and token registry."""
+    global TOKEN_REGISTRY
+    AUDIT_WRITER.close()
+    if TOKEN_REGISTRY is not None:
+        TOKEN_REGISTRY.close()
+        TOKEN_REGISTRY = None
+    if PLACEMENT_BACKEND is not None:
+        PLACEMENT_BACKEND.close()
+
+def get_routes():
+    global ROUTES
+    if ROUTES is None:
+        ROUTES = RoutingTable(DEFAULT_TARGET)
+        if os.path.exists(INVENTORY):
+            ROUTES.load_inventory(INVENTORY)
+        if os.path.exists(ROUTES_FILE):
+            ROUTES.load_routes(ROUTES_FILE)
+        logging.info('Loaded %d placement routes (default target: %s)', len(ROUTES), DEFAULT_TARGET)
+    return ROUTES
 
-            username = event.get('username', '')
-            message = event.get('message', '') or event.get('eventid', '')
-            logging.info('Observed event from %s: %s', src_ip, message)
+def map_srcip_to_target(src_ip):
+    """
+    Longest-prefix route for src_ip:
+    - an inventory host's own address routes to that host
+    - CIDRs in ROUTES_FILE route to the listed hosts/groups (joined as an Ansible pattern)
+    - anything else goes to DEFAULT_TARGET ('lab_hosts': every lab host)
+    """
+    return get_routes().lookup(src_ip)
 
-            # Simple adaptive policy:
-            # Rotate a honeytoken whenever an interactive session or login attempt is observed.
-            token_name = f"honey_{int(time.time())}.txt"
-            token_content = (
-                f"INSTR: Investigate file {token_name}\n"
-                f"Created by deception controller at {datetime.utcnow().isoformat()}Z\n"
-                "NOTE: This file is a decoy. Do not use as a credential.\n"
-            )
+def new_token():
+    """Fresh (token_name, token_content); metadata lives in the token registry."""
+    # the random part keeps names unique
+    token_name = f"honey_{int(time.time())}_{secrets.token_hex(4)}.txt"
+    token_content = (
+        f"INSTR: Investigate file {token_name}\n"
+        f"Created by deception controller at {datetime.utcnow().isoformat()}Z\n"
+        "NOTE: This file is a decoy. Do not use as a credential.\n"
+    )
+    return token_name, token_content
 
-            target = map_srcip_to_target(src_ip)
-            place_honeytoken(target, token_content, token_name)
+def handle_event(event, processed, limiter=None, shedder=None, audit=record_audit):
+    """
+    Dedup one Cowrie event and apply the placement policy.
+    - limiter: optional PlacementLimiter; events over their src_ip/session budget are suppressed
+      (only events a policy rule places draw from the budget)
+    - shedder: optional LoadShedder; while overloaded it drops, coalesces or only audits placements
+    - audit: sink for the records of audit-only shedding
+    Returns (target, (token_name, token_content, audit)) or None if nothing should be placed.
+    """
+    # Use 'session' or 'src_ip' or 'username' fields to identify interactions
+    src_ip = event.get('src_ip') or event.get('src_ip', 'unknown')
+    session = event.get('session') or ''
+    timestamp = event.get('timestamp') or ''
+    key = event_key(session, src_ip, timestamp)
+    if processed.seen(key):
+        DEDUP_HITS.inc()
+        return None
 
-            audit = {
+    username = event.get('username', '')
+    message = event.get('message', '') or event.get('eventid', '')
+    shedding = shedder is not None and shedder.shedding
+    # per-event logging alone would keep an overloaded controller behind
+    logging.log(logging.DEBUG if shedding else logging.INFO, 'Observed event from %s: %s', src_ip, message)
+    rule = POLICY.evaluate(event)
+    POLICY_DECISIONS.inc(rule=rule.name)
+    if rule.action != 'place':
+        logging.debug('Event from %s ignored by policy rule %s', src_ip, rule.name)
+        return None
+    shed = shedder.admit(event) if shedder is not None else None
+    if shed is not None:
+        EVENTS_SHED.inc(action=shed)
+        if shed == 'audit_only':
+            audit({
                 "timestamp": datetime.utcnow().isoformat() + "Z",
-                "action": "place_honeytoken",
-                "token": token_name,
+                "action": "placement_shed",
                 "src_ip": src_ip,
+                "session": session,
                 "username": username,
+                "rule": rule.name,
+                "eventid": event.get('eventid'),
+                "event_timestamp": timestamp,
                 "reason": message
-            }
-            record_audit(audit)
-        time.sleep(CHECK_INTERVAL)
+            })
+        return None
+    limited = limiter.check(src_ip, session) if limiter is not None else None
+    if limited is not None:
+        RATE_LIMITED.inc(bucket=limited)
+        logging.debug('Placement for %s (session %s) suppressed by %s rate limit', src_ip, session, limited)
+        return None
+    # events re-read after a crash (past the last checkpoint) keep the token they already have
+    if get_registry().placed_for(key):
+        logging.debug('Event from %s (session %s) already has a token; not placing again', src_ip, session)
+        return None
+
+    token_name, token_content = new_token()
+
+    target = rule.target or map_srcip_to_target(src_ip)
+    audit = {
+        "action": "place_honeytoken",
+        "token": token_name,
+        "target": target,
+        "src_ip": src_ip,
+        "session": session,
+        "username": username,
+        "rule": rule.name,
+        "reason": message,
+        "event_key": key
+    }
+    return target, (token_name, token_content, audit)
+
+def new_dedup():
+    return make_dedup(DEDUP_MODE, DEDUP_MAX_ENTRIES, DEDUP_WINDOW, DEDUP_FP_RATE)
+
+def new_limiter(clock=time.time):
+    if not RATE_LIMIT:
+        return None
+    return PlacementLimiter(RATE_IP_BURST, RATE_IP_REFILL, RATE_SESSION_BURST, RATE_SESSION_REFILL,
+                            clock=clock)
+
+def new_shedder(depth=None, clock=time.time):
+    return LoadShedder(SHED_MODE, SHED_MAX_LAG, SHED_RESUME_LAG, SHED_MAX_DEPTH, depth,
+                       SHED_PRIORITIES, SHED_MIN_PRIORITY, SHED_COALESCE_WINDOW, hold=SHED_HOLD,
+                       clock=clock)
+
+def new_lifecycle():
+    return TokenLifecycle(get_registry(), place_honeytokens, remove_honeytokens, new_token,
+                          record_audit, TOKEN_MATCHER, TOKEN_TTL, TOKEN_MAX_LIVE, TOKEN_ROTATE,
+                          TOKEN_SWEEP_INTERVAL)
+
+def wait_and_sweep(watcher, lifecycle, shedder=None, checkpointer=None):
+    """
+    Idle step of the async and sharded modes: the source has been read to the end,
+    so leave the shedding state if the queues allow; run a due lifecycle sweep, then
+    wait for events (or the next checkpoint).
+    """
+    if shedder is not None:
+        shedder.idle()
+    if lifecycle.due():
+        lifecycle.sweep()
+    timeout = lifecycle.timeout(CHECK_INTERVAL)
+    if checkpointer is not None:
+        timeout = checkpointer.timeout(timeout)
+    watcher.wait(REORDER_BUFFER.timeout(timeout))
+
+def resume(processed, limiter, path=CHECKPOINT_PATH):
+    """
+    Restore tailer positions, dedup and rate-limit state from the checkpoint at
+    path. Sharded mode keeps positions in the ingest checkpoint and dedup/limiter
+    in one checkpoint per shard, so either part may be missing.
+    """
+    state = load_checkpoint(path)
+    if state is None:
+        return processed, limiter
+    if 'positions' in state:
+        LOG_TAILER.positions = state['positions']
+    if 'dedup' in state:
+        if type(state['dedup']) is type(processed):
+            processed = state['dedup']
+        else:
+            logging.warning('Checkpoint dedup store does not match DECEPTION_DEDUP_MODE; starting empty')
+    if limiter is not None and type(state.get('limiter')) is type(limiter):
+        limiter = state['limiter']
+    logging.info('Resumed from checkpoint %s saved at %s', os.path.basename(path),
+                 datetime.utcfromtimestamp(state['saved_at']).isoformat() + "Z")
+    return processed, limiter
+
+def main_loop(profiler=None):
+    """
+    Single synchronous controller loop.
+    - profiler: optional LoopProfiler wrapped around each busy iteration (--profile)
+    """
+    ensure_directories()
+    lifecycle = new_lifecycle()
+    processed, limiter = resume(new_dedup(), new_limiter())
+    shedder = new_shedder()
+    # In inotify mode CHECK_INTERVAL is only a safety-net rescan period
+    scan, watcher = make_event_source()
+    batcher = PlacementBatcher(flush_placements, BATCH_MAX_SIZE, BATCH_MAX_DELAY)
+    checkpointer = Checkpointer(CHECKPOINT_PATH, lambda: {
+        "positions": LOG_TAILER.positions, "dedup": processed, "limiter": limiter,
+    }, CHECKPOINT_INTERVAL)
+    QUEUE_DEPTH.set_function(lambda: len(batcher))
+    SHEDDING.set_function(lambda: int(shedder.shedding))
+    start_metrics()
+    logging.info('Starting Deception Controller. Source: %s, watch mode: %s, check interval: %s sec',
+                 EVENT_SOURCE, watcher.mode, CHECK_INTERVAL)
+    iteration = profiler.iteration if profiler is not None else nullcontext
+    def process(events):
+        for event in events:
+            placement = handle_event(event, processed, limiter, shedder)
+            if placement is not None:
+                batcher.add(*placement)
+
+    try:
+        while True:
+            with iteration():
+                process(scan())
+                shedder.idle()
+                batcher.flush_due()
+                AUDIT_WRITER.flush_due()
+                logging.debug('Dedup stats: %s', processed.stats())
+                if limiter is not None:
+                    logging.debug('Rate limit stats: %s', limiter.stats())
+                if lifecycle.due():
+                    lifecycle.sweep()
+                if checkpointer.due():
+                    # only checkpoint state whose placements and audit records are on disk
+                    process(scan(flush=True))
+                    batcher.flush()
+                    AUDIT_WRITER.flush()
+                    checkpointer.save()
+            timeout = lifecycle.timeout(checkpointer.timeout(batcher.timeout(CHECK_INTERVAL)))
+            timeout = REORDER_BUFFER.timeout(timeout)
+            if profiler is not None:
+                profiler.tick()
+                timeout = profiler.timeout(timeout)
+            watcher.wait(AUDIT_WRITER.timeout(timeout))
+    finally:
+        process(observe_ingest(REORDER_BUFFER.drain()))
+        batcher.flush()
+        AUDIT_WRITER.flush()
+        checkpointer.save()
+        if profiler is not None:
+            profiler.close()
+        shutdown()
+
+def async_main():
+    """Run the controller as an asyncio pipeline (DECEPTION_CONTROLLER_MODE=async)."""
+    ensure_directories()
+    lifecycle = new_lifecycle()
+    processed, limiter = resume(new_dedup(), new_limiter())
+    scan, watcher = make_event_source()
+    checkpointer = Checkpointer(CHECKPOINT_PATH, lambda: {
+        "positions": LOG_TAILER.positions, "dedup": processed, "limiter": limiter,
+    }, CHECKPOINT_INTERVAL)
+    pipeline = AsyncPipeline(
+        scan=scan,
+        handle=lambda event: handle_event(event, processed, limiter, shedder),
+        place=place_honeytokens,
+        audit=record_audits,
+        flush_audit=AUDIT_WRITER.flush,
+        wait=lambda: wait_and_sweep(watcher, lifecycle, shedder, checkpointer),
+        workers=PLACEMENT_WORKERS,
+        queue_size=QUEUE_SIZE,
+        max_batch=BATCH_MAX_SIZE,
+        checkpoint=checkpointer)
+    shedder = new_shedder(depth=pipeline.depth)
+    QUEUE_DEPTH.set_function(pipeline.depth)
+    SHEDDING.set_function(lambda: int(shedder.shedding))
+    start_metrics()
+    logging.info('Starting Deception Controller (async). Watch mode: %s, placement workers: %s',
+                 watcher.mode, PLACEMENT_WORKERS)
+    try:
+        asyncio.run(pipeline.run())
+    finally:
+        shutdown()
+
+def shard_worker(shard, inbox, outbox):
+    """
+    Worker process for sharded mode: owns the dedup, rate-limit and load-shedding
+    state for its shard of src_ip and places tokens for each chunk it receives in one
+    batch per target. That state is checkpointed per shard (and per shard count, so
+    a resharded restart starts empty) whenever ingest asks and on exit.
+    """
+    # Ctrl-C reaches the whole process group; let the ingest process decide when to stop
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    logging.info('Shard %d started (pid %d)', shard, os.getpid())
+    global TOKEN_REGISTRY
+    # a SQLite connection must not be used across fork: leave the one inherited from
+    # ingest untouched (and unclosed) and look up placed events over our own
+    inherited, TOKEN_REGISTRY = TOKEN_REGISTRY, TokenRegistry(TOKEN_DB, readonly=True)
+    path = f"{CHECKPOINT_PATH}.shard{shard}of{SHARDS}"
+    processed, limiter = resume(new_dedup(), new_limiter(), path)
+    checkpointer = Checkpointer(path, lambda: {"dedup": processed, "limiter": limiter},
+                                CHECKPOINT_INTERVAL)
+    shedder = new_shedder()
+    for chunk in iter(inbox.get, None):
+        if chunk == CHECKPOINT:
+            checkpointer.save()
+            continue
+        by_target = {}
+        audits = []
+        for seq, event in chunk:
+            try:
+                # audit-only records go back with the chunk so ingest keeps them in order
+                placement = handle_event(event, processed, limiter, shedder,
+                                         audit=lambda entry, seq=seq: audits.append((seq, entry)))
+            except Exception as e:
+                logging.exception('Shard %d: handling event %d failed: %s', shard, seq, e)
+                continue
+            if placement is not None:
+                target, item = placement
+                by_target.setdefault(target, []).append((seq, item))
+        for target, items in by_target.items():
+            try:
+                place_honeytokens(target, [(name, content) for _, (name, content, _) in items])
+            except Exception as e:
+                logging.exception('Flushing %d placements for %s failed: %s', len(items), target, e)
+                continue
+            placed_at = datetime.utcnow().isoformat() + "Z"
+            audits.extend((seq, {"timestamp": placed_at, **audit}) for seq, (_, _, audit) in items)
+        # always acknowledge the chunk, or ingest holds back every later audit record
+        outbox.put((shard, chunk[-1][0], audits, shard_status(shedder)))
+    checkpointer.save()
+    if PLACEMENT_BACKEND is not None:
+        PLACEMENT_BACKEND.close()
+    outbox.put((shard, None, [], shard_status(shedder)))
+
+def shard_status(shedder):
+    """Worker side of a chunk ack: shedding state and counter increments since the last ack."""
+    counts = {}
+    for counter in SHARD_COUNTERS:
+        with counter.lock:
+            counts[counter.name], counter.values = counter.values, {}
+    return {"shedding": shedder.shedding, "counts": counts}
+
+def shard_reporter(shards):
+    """Ingest side: fold worker statuses into SHEDDING (any shard shedding) and SHARD_COUNTERS."""
+    shedding = [False] * shards
+    counters = {counter.name: counter for counter in SHARD_COUNTERS}
+    def report(shard, status):
+        shedding[shard] = status["shedding"]
+        for name, values in status["counts"].items():
+            for key, amount in values.items():
+                counters[name].inc(amount, **dict(key))
+    SHEDDING.set_function(lambda: int(any(shedding)))
+    return report
+
+def sharded_main():
+    """Run ingest here and policy/placement in SHARDS worker processes (DECEPTION_CONTROLLER_MODE=sharded)."""
+    ensure_directories()
+    lifecycle = new_lifecycle()
+    # positions only: each shard checkpoints its own dedup and rate-limit state
+    resume(None, None)
+    scan, watcher = make_event_source()
+    checkpointer = Checkpointer(CHECKPOINT_PATH, lambda: {"positions": LOG_TAILER.positions},
+                                CHECKPOINT_INTERVAL)
+    controller = ShardedController(shard_worker, SHARDS, chunk_size=BATCH_MAX_SIZE,
+                                   queue_chunks=max(1, QUEUE_SIZE // BATCH_MAX_SIZE))
+    QUEUE_DEPTH.set_function(controller.depth)
+    report = shard_reporter(controller.shards)
+    start_metrics()
+    logging.info('Starting Deception Controller (sharded). Watch mode: %s, shards: %s',
+                 watcher.mode, SHARDS)
+    try:
+        controller.run(scan, lambda: wait_and_sweep(watcher, lifecycle, checkpointer=checkpointer),
+                       record_audits, AUDIT_WRITER.flush, checkpoint=checkpointer, report=report)
+    finally:
+        shutdown()
+
+def replay_main():
+    """
+    Feed REPLAY_LOG through dedup, policy, batching, placement and audit at
+    REPLAY_SPEED, then report throughput, per-stage latency and peak memory
+    (DECEPTION_CONTROLLER_MODE=replay). Audit records go to REPLAY_AUDIT_LOG and
+    placed tokens to a fresh REPLAY_TOKEN_DB.
+    """
+    global AUDIT_WRITER, TOKEN_REGISTRY
+    ensure_directories()
+    AUDIT_WRITER = AuditWriter(REPLAY_AUDIT_LOG, AUDIT_BATCH, AUDIT_BATCH_BYTES,
+                               AUDIT_FLUSH_INTERVAL, AUDIT_FSYNC)
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(REPLAY_TOKEN_DB + suffix):
+            os.remove(REPLAY_TOKEN_DB + suffix)
+    TOKEN_REGISTRY = TokenRegistry(REPLAY_TOKEN_DB)
+    if os.path.isdir(REPLAY_LOG):
+        paths = [segment.path for segment in discover_segments(REPLAY_LOG)]
+    else:
+        paths = [REPLAY_LOG]
+    # rate limits run on recorded time so accelerated replays place what a live run would
+    clock = ReplayClock()
+    processed = new_dedup()
+    limiter = new_limiter(clock)
+    # shedding measures lag against where the paced schedule is, not the current event
+    shedder = new_shedder(clock=clock.scheduled)
+    stats = StageStats()
+    parser = EventParser(CONTROLLER_EVENTIDS, CONTROLLER_FIELDS)
+    placed = 0
+
+    def flush(target_group, items):
+        nonlocal placed
+        start = time.perf_counter()
+        place_honeytokens(target_group, [(name, content) for name, content, _ in items])
+        stats.add('placement', time.perf_counter() - start)
+        placed += len(items)
+        placed_at = datetime.utcnow().isoformat() + "Z"
+        start = time.perf_counter()
+        record_audits([{"timestamp": placed_at, **audit} for _, _, audit in items])
+        # per-record cost, so the stage stays comparable with the other per-event stages
+        per_record = (time.perf_counter() - start) / len(items)
+        for _ in items:
+            stats.add('audit', per_record)
+
+    batcher = PlacementBatcher(flush, BATCH_MAX_SIZE, BATCH_MAX_DELAY)
+    QUEUE_DEPTH.set_function(lambda: len(batcher))
+    start_metrics()
+    logging.info('Replaying %d log segment(s) from %s at %s, transport: %s', len(paths), REPLAY_LOG,
+                 f'{REPLAY_SPEED:g}x' if REPLAY_SPEED > 0 else 'full speed', TRANSPORT)
+    level = logging.getLogger().level
+    logging.getLogger().setLevel(REPLAY_LOG_LEVEL)
+    events = (event for event in map(parser, stream_lines(paths)) if event is not None)
+    count = 0
+    start = time.perf_counter()
+    try:
+        for event in paced(stats.timed('parse', events), REPLAY_SPEED, clock, event_epoch):
+            count += 1
+            EVENTS_INGESTED.inc()
+            t = time.perf_counter()
+            check_token_access(event)
+            stats.add('detect', time.perf_counter() - t)
+            t = time.perf_counter()
+            placement = handle_event(event, processed, limiter, shedder)
+            stats.add('policy', time.perf_counter() - t)
+            if placement is not None:
+                batcher.add(*placement)
+            batcher.flush_due()
+            AUDIT_WRITER.flush_due()
+        batcher.flush()
+        AUDIT_WRITER.flush()
+    finally:
+        elapsed = time.perf_counter() - start
+        logging.getLogger().setLevel(level)
+        shutdown()
+    lines = parser.parsed + parser.filtered + parser.errors
+    logging.info('Replayed %d events (%d lines, %d filtered, %d errors) in %.2f s: %.0f events/s, %.0f lines/s',
+                 count, lines, parser.filtered, parser.errors, elapsed,
+                 count / elapsed if elapsed else 0, lines / elapsed if elapsed else 0)
+    logging.info('Placed %d honeytoken(s); dedup: %s', placed, processed.stats())
+    logging.info('Load shedding: %s', shedder.stats())
+    for stage, s in stats.summary().items():
+        logging.info('  %-9s n=%-8d total %8.3f s  p50 %8.1f us  p95 %8.1f us  p99 %8.1f us  max %8.1f us',
+                     stage, s['count'], s['total'], s['p50'] * 1e6, s['p95'] * 1e6, s['p99'] * 1e6,
+                     s['max'] * 1e6)
+    logging.info('Peak RSS: %.1f MiB', peak_rss_mb())
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Adaptive deception controller. Most settings come from DECEPTION_* environment variables.')
+    parser.add_argument('--interval', type=float, metavar='SECONDS',
+                        help=f'event source check interval (DECEPTION_CHECK_INTERVAL, default: {CHECK_INTERVAL})')
+    parser.add_argument('--log-dir', action='append', metavar='DIR',
+                        help='Cowrie log directory to watch, or a lab logs directory with a cowrie/ '
+                             'subdirectory; repeat for several sensors (DECEPTION_COWRIE_LOG_DIRS, '
+                             f'default: {os.pathsep.join(COWRIE_LOG_DIRS)})')
+    parser.add_argument('--profile', action='store_true',
+                        help='profile loop iterations (cProfile) and allocations (tracemalloc) into '
+                             f'{PROFILE_DIR}; loop mode only')
+    parser.add_argument('--profile-interval', type=float, default=60, metavar='SECONDS',
+                        help='seconds per profile dump and allocation diff (default: %(default)s)')
+    parser.add_argument('--profile-duration', type=float, default=600, metavar='SECONDS',
+                        help='stop profiling after this long; 0 profiles until exit (default: %(default)s)')
+    parser.add_argument('--profile-sample', type=int, default=1, metavar='N',
+                        help='profile one loop iteration in N (default: %(default)s)')
+    parser.add_argument('--profile-top', type=int, default=25, metavar='N',
+                        help='entries in the text summaries (default: %(default)s)')
+    args = parser.parse_args(argv)
+    if args.profile and CONTROLLER_MODE in ('async', 'sharded', 'replay'):
+        parser.error(f'--profile wraps loop iterations and is not available in {CONTROLLER_MODE} mode')
+    return args
+
+def cowrie_log_dir(path):
+    """path, or its cowrie/ subdirectory when path is the lab's logs directory."""
+    path = os.path.normpath(os.path.expanduser(path))
+    cowrie = os.path.join(path, "cowrie")
+    if os.path.isdir(cowrie) and not os.path.exists(os.path.join(path, "cowrie.json")):
+        return cowrie
+    return path
+
+def apply_args(args):
+    """Command-line overrides of CHECK_INTERVAL and COWRIE_LOG_DIRS."""
+    global CHECK_INTERVAL, COWRIE_LOG_DIRS, REORDER_BUFFER
+    if args.interval is not None:
+        CHECK_INTERVAL = args.interval
+    if args.log_dir:
+        COWRIE_LOG_DIRS = list(dict.fromkeys(cowrie_log_dir(d) for d in args.log_dir))
+        REORDER_BUFFER = ReorderBuffer(REORDER_WINDOW, REORDER_MAX_EVENTS, COWRIE_LOG_DIRS)
 
 if __name__ == "__main__":
-    main_loop()
+    args = parse_args()
+    apply_args(args)
+    # SIGTERM (systemd, docker stop) unwinds like Ctrl-C so buffered audit records are flushed
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    atexit.register(shutdown)
+    if CONTROLLER_MODE == 'async':
+        async_main()
+    elif CONTROLLER_MODE == 'sharded':
+        sharded_main()
+    elif CONTROLLER_MODE == 'replay':
+        replay_main()
+    else:
+        profiler = None
+        if args.profile:
+            profiler = LoopProfiler(PROFILE_DIR, args.profile_interval, args.profile_duration,
+                                    args.profile_sample, args.profile_top)
+        main_loop(profiler)
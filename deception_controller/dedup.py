@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Bounded de-duplication of Cowrie events
+- Events are keyed by a fixed-width 64-bit hash of session|src_ip|timestamp
+  instead of keeping the full string
+- LRUDedup: keep the most recently seen max_entries keys
+- WindowDedup: keep keys seen within the last window_seconds (plus a hard cap)
+- BloomDedup: two rotating Bloom filters; constant memory, small false-positive rate
+
+All stores share seen(key) -> bool and stats() -> dict of counters.
+"""
+
+import math
+import time
+import hashlib
+from collections import OrderedDict
+
+
+def event_key(session, src_ip, timestamp):
+    """64-bit key for an event; collisions are negligible at controller volumes."""
+    raw = f"{session}|{src_ip}|{timestamp}".encode('utf-8', 'replace')
+    return int.from_bytes(hashlib.blake2b(raw, digest_size=8).digest(), 'little')
+
+
+class LRUDedup:
+    """Exact dedup over the most recent max_entries keys."""
+
+    def __init__(self, max_entries=1000000):
+        self.max_entries = max_entries
+        self.keys = OrderedDict()
+        self.hits = 0
+        self.inserts = 0
+        self.evictions = 0
+
+    def seen(self, key):
+        """Return True if key was seen before; otherwise remember it and return False."""
+        if key in self.keys:
+            self.keys.move_to_end(key)
+            self.hits += 1
+            return True
+        self.keys[key] = None
+        self.inserts += 1
+        if len(self.keys) > self.max_entries:
+            self.keys.popitem(last=False)
+            self.evictions += 1
+        return False
+
+    def __len__(self):
+        return len(self.keys)
+
+    def stats(self):
+        return {"mode": "lru", "entries": len(self.keys), "hits": self.hits,
+                "inserts": self.inserts, "evictions": self.evictions,
+                "false_positive_rate": 0.0}
+
+
+class WindowDedup:
+    """Exact dedup over keys first seen within the last window_seconds."""
+
+    def __init__(self, window_seconds=3600, max_entries=1000000, clock=time.time):
+        self.window = window_seconds
+        self.max_entries = max_entries
+        self.clock = clock
+        # key -> first-seen wall-clock time, oldest first (wall clock so the
+        # window survives a checkpoint/restart)
+        self.keys = OrderedDict()
+        self.hits = 0
+        self.inserts = 0
+        self.evictions = 0
+
+    def expire(self, now):
+        cutoff = now - self.window
+        keys = self.keys
+        while keys:
+            key, first_seen = next(iter(keys.items()))
+            if first_seen > cutoff and len(keys) <= self.max_entries:
+                break
+            keys.popitem(last=False)
+            self.evictions += 1
+
+    def seen(self, key):
+        now = self.clock()
+        self.expire(now)
+        if key in self.keys:
+            self.hits += 1
+            return True
+        self.keys[key] = now
+        self.inserts += 1
+        self.expire(now)
+        return False
+
+    def __len__(self):
+        return len(self.keys)
+
+    def stats(self):
+        return {"mode": "window", "entries": len(self.keys), "hits": self.hits,
+                "inserts": self.inserts, "evictions": self.evictions,
+                "false_positive_rate": 0.0}
+
+
+class BloomDedup:
+    """
+    Approximate dedup in fixed memory.
+    - capacity keys per generation at the target error_rate
+    - when the active filter is full it becomes the previous generation and a fresh
+      one starts, so memory stays at two filters and old keys age out
+    - a key is reported seen if either generation contains it
+    """
+
+    def __init__(self, capacity=1000000, error_rate=0.001):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.nbits = max(64, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.nhashes = max(1, round(self.nbits / capacity * math.log(2)))
+        self.current = bytearray((self.nbits + 7) // 8)
+        self.previous = bytearray(len(self.current))
+        self.count = 0
+        self.hits = 0
+        self.inserts = 0
+        self.evictions = 0
+
+    def positions(self, key):
+        # Kirsch-Mitzenmacher double hashing from one 128-bit digest
+        digest = hashlib.blake2b(key.to_bytes(8, 'little'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.nbits for i in range(self.nhashes)]
+
+    @staticmethod
+    def contains(bits, positions):
+        return all(bits[p >> 3] & (1 << (p & 7)) for p in positions)
+
+    def seen(self, key):
+        positions = self.positions(key)
+        if self.contains(self.current, positions) or self.contains(self.previous, positions):
+            self.hits += 1
+            return True
+        if self.count >= self.capacity:
+            self.previous, self.current = self.current, self.previous
+            self.current[:] = bytes(len(self.current))
+            self.evictions += self.count
+            self.count = 0
+        for p in positions:
+            self.current[p >> 3] |= 1 << (p & 7)
+        self.count += 1
+        self.inserts += 1
+        return False
+
+    def __len__(self):
+        return self.count
+
+    def false_positive_rate(self):
+        """Estimated probability that a new key is wrongly reported as seen."""
+        def fill(n):
+            return (1 - math.exp(-self.nhashes * n / self.nbits)) ** self.nhashes
+        previous_n = self.capacity if self.evictions else 0
+        return 1 - (1 - fill(self.count)) * (1 - fill(previous_n))
+
+    def stats(self):
+        return {"mode": "bloom", "entries": self.count, "hits": self.hits,
+                "inserts": self.inserts, "evictions": self.evictions,
+                "false_positive_rate": self.false_positive_rate(),
+                "bytes": 2 * len(self.current)}
+
+
+def make_dedup(mode='lru', max_entries=1000000, window_seconds=3600, error_rate=0.001):
+    """Build the dedup store selected by mode ('lru', 'window' or 'bloom')."""
+    if mode == 'lru':
+        return LRUDedup(max_entries)
+    if mode == 'window':
+        return WindowDedup(window_seconds, max_entries)
+    if mode == 'bloom':
+        return BloomDedup(max_entries, error_rate)
+    raise ValueError(f"Unknown dedup mode: {mode}")
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Elasticsearch event source for the controller
+- Pulls new Cowrie events with a point-in-time (PIT) and search_after paging,
+  so paging is consistent while Cowrie keeps indexing
+- Persists its cursor (last timestamp plus the ids already seen at that
+  timestamp) so a restart resumes where it stopped
+- Adapts the page size: grows while pages come back fast, shrinks when slow
+- Uses only urllib; point DECEPTION_ES_URL at any server speaking the ES 7.x API
+"""
+
+import os
+import json
+import time
+import logging
+import urllib.request
+
+
+class ElasticsearchSource:
+    """
+    - url: base URL such as http://localhost:9200
+    - index: index pattern Cowrie writes to
+    - cursor_path: JSON file holding the resume position (None keeps it in memory only)
+    - page_size / min_page / max_page: initial and bounds for adaptive paging
+    - target_latency: seconds per page the page size is tuned towards
+    - fields: _source fields to fetch (None fetches whole documents)
+    - eventids: only yield these eventids (None yields all)
+    """
+
+    def __init__(self, url, index='cowrie-*', timestamp_field='timestamp', cursor_path=None,
+                 page_size=500, min_page=50, max_page=10000, target_latency=0.25,
+                 keep_alive='1m', timeout=10, fields=None, eventids=None):
+        self.url = url.rstrip('/')
+        self.index = index
+        self.timestamp_field = timestamp_field
+        self.cursor_path = cursor_path
+        self.page_size = page_size
+        self.min_page = min_page
+        self.max_page = max_page
+        self.target_latency = target_latency
+        self.keep_alive = keep_alive
+        self.timeout = timeout
+        self.fields = list(fields) if fields else None
+        self.eventids = frozenset(eventids) if eventids else None
+        self.cursor = {"timestamp": None, "ids": []}
+        self.load_cursor()
+
+    def request(self, method, path, body=None):
+        data = json.dumps(body).encode('utf-8') if body is not None else None
+        req = urllib.request.Request(self.url + path, data=data, method=method,
+                                     headers={'Content-Type': 'application/json'})
+        with urllib.request.urlopen(req, timeout=self.timeout) as resp:
+            return json.loads(resp.read() or b'{}')
+
+    def load_cursor(self):
+        if not self.cursor_path or not os.path.exists(self.cursor_path):
+            return
+        try:
+            with open(self.cursor_path, 'r') as fh:
+                self.cursor = json.load(fh)
+            logging.info('Resuming Elasticsearch source from %s', self.cursor.get('timestamp'))
+        except (OSError, ValueError) as e:
+            logging.warning('Ignoring unreadable ES cursor %s: %s', self.cursor_path, e)
+
+    def save_cursor(self):
+        if not self.cursor_path:
+            return
+        tmp = self.cursor_path + '.tmp'
+        with open(tmp, 'w') as fh:
+            json.dump(self.cursor, fh)
+        os.replace(tmp, self.cursor_path)
+
+    def advance(self, hit_id, timestamp):
+        if timestamp is None:
+            # a hit without a timestamp must not move the cursor back to None, which
+            # would turn the next query() into match_all; range queries never return it again
+            if self.cursor['timestamp'] is None:
+                self.cursor['ids'].append(hit_id)
+            return
+        if timestamp != self.cursor['timestamp']:
+            self.cursor = {"timestamp": timestamp, "ids": []}
+        self.cursor['ids'].append(hit_id)
+
+    def tune(self, elapsed, full_page):
+        if elapsed > self.target_latency * 2:
+            self.page_size = max(self.min_page, self.page_size // 2)
+        elif full_page and elapsed < self.target_latency / 2:
+            self.page_size = min(self.max_page, self.page_size * 2)
+
+    def query(self):
+        start = self.cursor['timestamp']
+        if start is None:
+            return {"match_all": {}}
+        # inclusive so events sharing the last timestamp are not lost; ids in the
+        # cursor filter the ones already delivered
+        return {"range": {self.timestamp_field: {"gte": start}}}
+
+    def poll(self):
+        """Yield events indexed since the last poll, oldest first."""
+        try:
+            pit = self.request('POST', f"/{self.index}/_pit?keep_alive={self.keep_alive}")['id']
+        except Exception as e:
+            logging.warning('Elasticsearch unavailable at %s: %s', self.url, e)
+            return
+        seen = set(self.cursor['ids'])
+        search_after = None
+        try:
+            while True:
+                body = {
+                    "size": self.page_size,
+                    "query": self.query(),
+                    "pit": {"id": pit, "keep_alive": self.keep_alive},
+                    "sort": [{self.timestamp_field: "asc"}, {"_shard_doc": "asc"}],
+                    "track_total_hits": False,
+                }
+                if self.fields is not None:
+                    body["_source"] = self.fields
+                if search_after is not None:
+                    body["search_after"] = search_after
+                started = time.monotonic()
+                result = self.request('POST', '/_search', body)
+                hits = result.get('hits', {}).get('hits', [])
+                self.tune(time.monotonic() - started, len(hits) >= body["size"])
+                pit = result.get('pit_id', pit)
+                if not hits:
+                    break
+                for hit in hits:
+                    event = hit.get('_source', {})
+                    if hit['_id'] in seen:
+                        continue
+                    self.advance(hit['_id'], event.get(self.timestamp_field))
+                    if self.eventids is None or event.get('eventid') in self.eventids:
+                        yield event
+                search_after = hits[-1]['sort']
+                self.save_cursor()
+        except Exception as e:
+            logging.exception('Elasticsearch poll failed: %s', e)
+        finally:
+            self.save_cursor()
+            try:
+                self.request('DELETE', '/_pit', {"id": pit})
+            except Exception:
+                pass
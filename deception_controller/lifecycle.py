@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Honeytoken lifecycle: expiry, rotation and garbage collection
+- Tokens older than ttl are expired; with rotate on, each is replaced by a fresh
+  token on the same host carrying the same attacker attribution
+- Hosts holding more than max_live live tokens lose their oldest ones
+- Each sweep removes all of a host's expired and evicted files with one
+  backend remove() and places its replacements with one place(), then marks
+  the old tokens retired in the registry and audits every retirement/rotation
+- A host whose removal fails keeps its tokens live and is retried next sweep;
+  so do the expired tokens of a host whose replacements could not be placed
+"""
+
+import time
+import logging
+from datetime import datetime
+
+
+class TokenLifecycle:
+    """
+    - registry: TokenRegistry listing live tokens, their host and age
+    - place(target, tokens) / remove(target, names): placement backend calls,
+      each returning the failed hosts
+    - new_token(): (token_name, token_content) for a replacement
+    - audit(entry): audit record sink
+    - matcher: TokenMatcher kept in step with the live set
+    - ttl: seconds before a token expires (0: never)
+    - max_live: live tokens allowed per host or target group (0: unlimited)
+    - rotate: replace expired tokens instead of only removing them
+    - interval: seconds between sweeps
+    """
+
+    def __init__(self, registry, place, remove, new_token, audit, matcher, ttl=7 * 86400,
+                 max_live=1000, rotate=True, interval=60, clock=time.time):
+        self.registry = registry
+        self.place = place
+        self.remove = remove
+        self.new_token = new_token
+        self.audit = audit
+        self.matcher = matcher
+        self.ttl = ttl
+        self.max_live = max_live
+        self.rotate = rotate
+        self.interval = interval
+        self.clock = clock
+        self.last = clock()
+        self.sweeps = 0
+        self.retired = 0
+        self.rotated = 0
+
+    @property
+    def enabled(self):
+        return bool(self.interval) and bool(self.ttl or self.max_live)
+
+    def timeout(self, default):
+        if not self.enabled:
+            return default
+        return max(0.0, min(default, self.last + self.interval - self.clock()))
+
+    def due(self):
+        return self.enabled and self.clock() - self.last >= self.interval
+
+    def sweep(self):
+        """Expire, evict and rotate across every host; returns (retired, rotated)."""
+        start = time.perf_counter()
+        now = self.clock()
+        self.last = now
+        cutoff = now - self.ttl if self.ttl else None
+        plans = {}  # host -> [expired rows, evicted rows]
+        if cutoff is not None:
+            for row in self.registry.expired(cutoff):
+                plans.setdefault(row['host'], [[], []])[0].append(row)
+        if self.max_live:
+            for host, live in self.registry.live_counts_by_host().items():
+                expired = plans.get(host, [[], []])[0]
+                kept = live - len(expired)
+                replacing = min(len(expired), self.max_live) if self.rotate else 0
+                excess = kept + replacing - self.max_live
+                if excess > 0:
+                    plans.setdefault(host, [[], []])[1].extend(
+                        self.registry.oldest_live(host, excess, since=cutoff))
+        retired = rotated = 0
+        for host, (expired, evicted) in plans.items():
+            r, n = self.sweep_host(host, expired, evicted, now)
+            retired += r
+            rotated += n
+        self.sweeps += 1
+        self.retired += retired
+        self.rotated += rotated
+        if plans:
+            logging.info('Token sweep: %d retired, %d rotated on %d host(s) in %.1f ms',
+                         retired, rotated, len(plans), (time.perf_counter() - start) * 1000)
+        return retired, rotated
+
+    def sweep_host(self, host, expired, evicted, now):
+        rows = expired + evicted
+        names = [row['name'] for row in rows]
+        failed = self.remove(host, names)
+        if failed:
+            logging.error('Could not remove %d honeytoken(s) from %s (failed: %s); retrying next sweep',
+                          len(names), host, ', '.join(failed))
+            return 0, 0
+        old = []
+        if self.rotate and expired:
+            old = expired[:self.max_live] if self.max_live else expired
+        tokens = [self.new_token() for _ in old]
+        if tokens:
+            failed = self.place(host, tokens)
+            if failed:
+                logging.error('Rotation placement failed on %s (failed: %s); keeping %d expired '
+                              'token(s) live until the next sweep', host, ', '.join(failed), len(old))
+                # a target group may have taken some of them: leave no unregistered files behind
+                self.remove(host, [name for name, _ in tokens])
+                kept = {row['name'] for row in old}
+                expired = [row for row in expired if row['name'] not in kept]
+                names = [row['name'] for row in expired + evicted]
+                old, tokens = [], []
+        if not names:
+            return 0, 0
+        self.registry.set_state(names, 'retired', now)
+        for name in names:
+            self.matcher.retire(name)
+        stamp = datetime.utcnow().isoformat() + "Z"
+        for reason, batch in (('ttl', expired), ('max_live', evicted)):
+            for row in batch:
+                self.audit({"timestamp": stamp, "action": "retire_honeytoken", "token": row['name'],
+                            "target": host, "src_ip": row['src_ip'], "reason": reason})
+        if not tokens:
+            return len(names), 0
+        self.registry.add_many([(name, host, row['src_ip'], row['session'], row['username'],
+                                 f"rotation of {row['name']}", None)
+                                for (name, _), row in zip(tokens, old)])
+        self.matcher.add_many(name for name, _ in tokens)
+        for (name, _), row in zip(tokens, old):
+            self.audit({"timestamp": stamp, "action": "rotate_honeytoken", "token": name,
+                        "replaces": row['name'], "target": host, "src_ip": row['src_ip'],
+                        "reason": "ttl"})
+        return len(names), len(tokens)
+
+    def stats(self):
+        return {"sweeps": self.sweeps, "retired": self.retired, "rotated": self.rotated}
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Discovery and streaming of Cowrie log segments
+- A segment is the live log (cowrie.json), a rotated copy (cowrie.json.2025-12-10,
+  cowrie.json.1) or a compressed rotation (cowrie.json.2025-12-10.gz)
+- Segments are ordered oldest first: rotated ones by the date in their suffix
+  (falling back to mtime), live logs last
+- stream_lines() yields raw lines across segments in that order, decompressing
+  the next few .gz segments in background threads while the current one is consumed
+"""
+
+import os
+import re
+import gzip
+import queue
+import threading
+from datetime import datetime
+from collections import deque
+
+SEGMENT_RE = re.compile(r'^(?P<base>.+\.json)(?:\.(?P<suffix>(?!gz$)[^.]+))?(?P<gz>\.gz)?$')
+DATE_FORMATS = ('%Y-%m-%d', '%Y_%m_%d', '%Y%m%d', '%Y-%m-%d-%H', '%Y-%m-%dT%H')
+BLOCK_SIZE = 1024 * 1024
+PREFETCH_BLOCKS = 8  # decompressed blocks buffered per segment
+
+
+class Segment:
+    __slots__ = ('path', 'live', 'compressed', 'sort_time')
+
+    def __init__(self, path, live, compressed, sort_time):
+        self.path = path
+        self.live = live
+        self.compressed = compressed
+        self.sort_time = sort_time
+
+    def __repr__(self):
+        return f"Segment({self.path!r}, live={self.live}, compressed={self.compressed})"
+
+
+def suffix_time(suffix):
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(suffix, fmt).timestamp()
+        except ValueError:
+            continue
+    return None
+
+
+def discover_segments(log_dir, compressed=True):
+    """
+    List the Cowrie segments in log_dir, oldest first.
+    - compressed: include .gz segments
+    """
+    segments = []
+    for fname in os.listdir(log_dir):
+        m = SEGMENT_RE.match(fname)
+        if not m or (m.group('gz') and not compressed):
+            continue
+        path = os.path.join(log_dir, fname)
+        try:
+            mtime = os.stat(path).st_mtime
+        except FileNotFoundError:
+            continue
+        suffix = m.group('suffix')
+        live = suffix is None and not m.group('gz')
+        sort_time = (suffix_time(suffix) if suffix else None) or mtime
+        segments.append(Segment(path, live, bool(m.group('gz')), sort_time))
+    segments.sort(key=lambda s: (s.live, s.sort_time, s.path))
+    return segments
+
+
+def read_blocks(path):
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rb') as fh:
+        while True:
+            block = fh.read(BLOCK_SIZE)
+            if not block:
+                return
+            yield block
+
+
+class Prefetcher(threading.Thread):
+    """Decompress one segment ahead of the consumer into a bounded queue."""
+
+    def __init__(self, path):
+        super().__init__(name=f'prefetch-{os.path.basename(path)}', daemon=True)
+        self.path = path
+        self.blocks = queue.Queue(PREFETCH_BLOCKS)
+        self.stopped = threading.Event()
+
+    def run(self):
+        try:
+            for block in read_blocks(self.path):
+                if not self.put(block):
+                    return
+            self.put(None)
+        except Exception as e:
+            self.put(e)
+
+    def put(self, item):
+        while not self.stopped.is_set():
+            try:
+                self.blocks.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def __iter__(self):
+        while True:
+            item = self.blocks.get()
+            if item is None:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+
+    def stop(self):
+        self.stopped.set()
+
+
+def stream_lines(paths, workers=2):
+    """
+    Yield raw lines (bytes, without the newline) from paths in order.
+    - workers: how many compressed segments may be decompressing at once
+    """
+    paths = iter(paths)
+    pending = deque()
+
+    def fill():
+        running = sum(1 for src in pending if isinstance(src, Prefetcher))
+        while len(pending) < max(1, workers):
+            path = next(paths, None)
+            if path is None:
+                return
+            if path.endswith('.gz') and running < workers:
+                src = Prefetcher(path)
+                src.start()
+                running += 1
+            else:
+                src = path
+            pending.append(src)
+
+    src = None
+    fill()
+    try:
+        while pending:
+            src = pending.popleft()
+            fill()
+            blocks = src if isinstance(src, Prefetcher) else read_blocks(src)
+            leftover = b''
+            for block in blocks:
+                lines = (leftover + block).split(b'\n')
+                leftover = lines.pop()
+                for line in lines:
+                    yield line
+            if leftover:
+                yield leftover
+    finally:
+        for prefetched in [src, *pending]:
+            if isinstance(prefetched, Prefetcher):
+                prefetched.stop()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Incremental tailing of Cowrie JSON logs
+- Remembers (inode, offset) per log file so each scan only reads newly appended bytes
+- Holds back a partial trailing line until Cowrie finishes writing it
+- Restarts from byte 0 when a file is truncated or replaced (rotation)
+- Follows a file across rotation (cowrie.json -> cowrie.json.2025-12-10) by inode,
+  so lines written just before the rotation are still read from the rotated copy
+"""
+
+import os
+import logging
+
+from cowrie_parse import EventParser
+from log_segments import discover_segments
+
+READ_CHUNK = 1024 * 1024  # bytes per read() while catching up on a file
+
+
+class LogTailer:
+    """
+    Per-file read positions for a Cowrie log directory.
+    - positions maps path -> (inode, offset of the first unread byte)
+    - offsets only ever advance past complete lines ending in newline
+    - parser: callable turning a raw line into an event or None (default: every event)
+    """
+
+    def __init__(self, parser=None):
+        self.parser = parser or EventParser()
+        self.positions = {}
+
+    def files(self, log_dir):
+        """
+        Paths to read this poll, oldest first.
+        - live logs are always read
+        - uncompressed rotated segments are read only while they hold a tracked
+          position, i.e. they were live logs this tailer was following
+        """
+        segments = discover_segments(log_dir, compressed=False)
+        by_inode = {}
+        for seg in segments:
+            try:
+                by_inode[os.stat(seg.path).st_ino] = seg.path
+            except FileNotFoundError:
+                continue
+        # carry positions over to the new name of a rotated file
+        for path, (inode, offset) in list(self.positions.items()):
+            moved_to = by_inode.get(inode)
+            if moved_to and moved_to != path and self.positions.get(moved_to, (None,))[0] != inode:
+                del self.positions[path]
+                self.positions[moved_to] = (inode, offset)
+        return [seg.path for seg in segments if seg.live or seg.path in self.positions]
+
+    def poll(self, log_dir):
+        """Yield events appended to any log file since the previous poll."""
+        paths = self.files(log_dir)
+        # forget files that were removed so a reused inode starts clean; positions of
+        # other directories polled by the same tailer are left alone
+        log_dir = os.path.normpath(log_dir)
+        for stale in {path for path in self.positions
+                      if os.path.normpath(os.path.dirname(path)) == log_dir} - set(paths):
+            del self.positions[stale]
+        for path in paths:
+            try:
+                yield from self.read_new(path)
+            except FileNotFoundError:
+                self.positions.pop(path, None)
+            except Exception as e:
+                logging.exception('Failed to read cowrie log %s: %s', path, e)
+
+    def read_new(self, path):
+        """Yield events from the unread tail of a single file."""
+        with open(path, 'rb') as fh:
+            st = os.fstat(fh.fileno())
+            inode, offset = self.positions.get(path, (st.st_ino, 0))
+            if inode != st.st_ino:
+                logging.info('Cowrie log %s was rotated; reading from start', path)
+                offset = 0
+            elif st.st_size < offset:
+                logging.info('Cowrie log %s was truncated; reading from start', path)
+                offset = 0
+            if st.st_size == offset:
+                self.positions[path] = (st.st_ino, offset)
+                return
+            fh.seek(offset)
+            pending = b''
+            while True:
+                chunk = fh.read(READ_CHUNK)
+                if not chunk:
+                    break
+                lines = (pending + chunk).split(b'\n')
+                pending = lines.pop()
+                for line in lines:
+                    offset += len(line) + 1
+                    # record progress before yielding so a consumer that
+                    # stops early does not see the same line again
+                    self.positions[path] = (st.st_ino, offset)
+                    event = self.parser(line)
+                    if event is not None:
+                        yield event
+
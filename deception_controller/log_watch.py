@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Wake-up strategies for the controller loop
+- InotifyWatcher: blocks on an inotify fd for the Cowrie log directories and returns
+  as soon as Cowrie appends, creates or rotates a file in any of them (Linux only, via libc)
+- PollWatcher: the original fixed-interval sleep, used where inotify is unavailable
+"""
+
+import os
+import time
+import errno
+import select
+import ctypes
+import ctypes.util
+import logging
+
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+
+class PollWatcher:
+    """Sleep for the full interval; every tick triggers a scan."""
+
+    mode = 'poll'
+
+    def wait(self, timeout):
+        time.sleep(timeout)
+        return True
+
+    def close(self):
+        pass
+
+
+class InotifyWatcher:
+    """
+    Block until one of the watched directories changes.
+    - paths: a directory or a list of directories, all watched on one inotify fd
+    - wait(timeout) returns True when something changed, False when the timeout expired
+    - pending notifications are drained in one go so a burst of appends costs one scan
+    """
+
+    mode = 'inotify'
+
+    def __init__(self, paths):
+        if isinstance(paths, str):
+            paths = [paths]
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, 'inotify_init1: ' + os.strerror(err))
+        for path in paths:
+            wd = libc.inotify_add_watch(self.fd, os.fsencode(path), WATCH_MASK)
+            if wd < 0:
+                err = ctypes.get_errno()
+                os.close(self.fd)
+                raise OSError(err, 'inotify_add_watch %s: %s' % (path, os.strerror(err)))
+
+    def wait(self, timeout):
+        try:
+            ready, _, _ = select.select([self.fd], [], [], timeout)
+        except InterruptedError:
+            return False
+        if not ready:
+            return False
+        self.drain()
+        return True
+
+    def drain(self):
+        while True:
+            try:
+                if not os.read(self.fd, 65536):
+                    return
+            except OSError as e:
+                if e.errno in (errno.EAGAIN, errno.EWOULDBLOCK):
+                    return
+                raise
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+def make_watcher(log_dirs, mode='auto'):
+    """
+    Build a watcher for log_dirs (one directory or a list).
+    - mode 'inotify' requires inotify; 'poll' always sleeps; 'auto' tries inotify first
+    """
+    if mode == 'poll':
+        return PollWatcher()
+    try:
+        return InotifyWatcher(log_dirs)
+    except (OSError, AttributeError) as e:
+        if mode == 'inotify':
+            raise
+        logging.warning('inotify unavailable (%s); falling back to polling', e)
+        return PollWatcher()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Time-ordered merging of Cowrie events from several sensors
+- merge_streams(): heap-based k-way merge of per-sensor event streams for
+  batch readers (scoring), each stream first passed through a bounded reorder
+  window so small local disorder is fixed without buffering whole logs
+- ReorderBuffer: the live counterpart; events polled from several sources are
+  held in a heap and released in timestamp order once every source has moved
+  past them, or at the latest after window seconds
+Events without a parseable timestamp are passed through in arrival order.
+"""
+
+import time
+import heapq
+import itertools
+from collections import deque
+
+from cowrie_parse import event_epoch
+
+
+def reorder(events, window, key=event_epoch):
+    """
+    Yield events sorted by timestamp, assuming none arrives more than window
+    seconds (event time) behind the newest one seen so far; later stragglers
+    are yielded as soon as they arrive.
+    Yields (ts, event) with ts None for events without a timestamp.
+    """
+    heap = []
+    seq = itertools.count()
+    newest = float('-inf')
+    for event in events:
+        ts = key(event.get('timestamp'))
+        if ts is None:
+            yield None, event
+            continue
+        newest = max(newest, ts)
+        heapq.heappush(heap, (ts, next(seq), event))
+        while heap and heap[0][0] <= newest - window:
+            ts, _, ready = heapq.heappop(heap)
+            yield ts, ready
+    while heap:
+        ts, _, ready = heapq.heappop(heap)
+        yield ts, ready
+
+
+def merge_streams(streams, window=5.0, key=event_epoch):
+    """K-way merge of event iterables into one timestamp-ordered iterator."""
+    ordered = [reorder(stream, window, key) for stream in streams]
+    if len(ordered) == 1:
+        return (event for _, event in ordered[0])
+    merged = heapq.merge(*ordered, key=lambda item: float('-inf') if item[0] is None else item[0])
+    return (event for _, event in merged)
+
+
+class ReorderBuffer:
+    """
+    Bounded reorder window for events polled from several live sources.
+    - window: longest time (seconds, wall clock) an event is held back
+    - max_events: hard cap on held events; the oldest are released beyond it
+    - sources: sources known up front; until one of them produces an event it
+      holds everything back for the full window
+    An event is released once its timestamp is no later than the newest
+    timestamp of every source (no source can still precede it), once it is
+    window seconds older than the newest event, or once it has been held for
+    window seconds.
+    """
+
+    def __init__(self, window=2.0, max_events=100000, sources=(), key=event_epoch, clock=time.monotonic):
+        self.window = window
+        self.max_events = max_events
+        self.key = key
+        self.clock = clock
+        self.heap = []
+        self.seq = itertools.count()
+        # (held, seq) in push order, so held is monotonic; entries released out of
+        # order are dropped lazily once they reach the head (seq in self.gone)
+        self.holds = deque()
+        self.gone = set()
+        self.latest = dict.fromkeys(sources, float('-inf'))  # source -> newest timestamp seen
+        self.late = 0     # events that arrived behind an already released one
+        self.released = float('-inf')
+
+    def push(self, source, event):
+        """Hold event; returns False if it has no timestamp and should pass straight through."""
+        ts = self.key(event.get('timestamp'))
+        if ts is None:
+            return False
+        if ts > self.latest.get(source, float('-inf')):
+            self.latest[source] = ts
+        seq, held = next(self.seq), self.clock()
+        heapq.heappush(self.heap, (ts, seq, held, event))
+        self.holds.append((held, seq))
+        return True
+
+    def pop_ready(self):
+        """Yield held events that can no longer be preceded, oldest first."""
+        if not self.heap:
+            return
+        watermark = min(self.latest.values())
+        watermark = max(watermark, max(self.latest.values()) - self.window)
+        expired = self.clock() - self.window
+        heap = self.heap
+        while heap and (heap[0][0] <= watermark or heap[0][2] <= expired
+                        or len(heap) > self.max_events):
+            yield self.release(heapq.heappop(heap))
+
+    def drain(self):
+        """Yield every held event in timestamp order."""
+        while self.heap:
+            yield self.release(heapq.heappop(self.heap))
+
+    def release(self, item):
+        ts, seq, _, event = item
+        holds = self.holds
+        if holds[0][1] == seq:
+            holds.popleft()
+            while holds and holds[0][1] in self.gone:
+                self.gone.remove(holds.popleft()[1])
+        else:
+            self.gone.add(seq)
+        if ts < self.released:
+            self.late += 1
+        else:
+            self.released = ts
+        return event
+
+    def timeout(self, default):
+        """Seconds until the oldest held event must be released, capped at default."""
+        if not self.heap:
+            return default
+        oldest = self.holds[0][0]
+        return max(0.0, min(default, oldest + self.window - self.clock()))
+
+    def __len__(self):
+        return len(self.heap)
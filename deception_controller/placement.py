@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Pluggable honeytoken placement backends
+- Every backend implements place(target, tokens) and remove(target, names), both
+  returning the list of failed hosts/targets, and close(); tokens is a list of
+  (token_name, token_content); remove() deletes a whole batch in one operation per host
+- ansible: ad-hoc copy (one token) or unarchive (a batch packed into one tar.gz)
+- ssh: writes over pooled SFTP sessions (see ssh_pool.py)
+- local: the controller shares a host with Cowrie; tokens are written straight
+  into the local token directory with temp file + rename, no subprocess
+- noop: logs and discards placements (replay benchmarks, dry runs)
+
+A new backend subclasses PlacementBackend and is added to BACKENDS.
+"""
+
+import io
+import os
+import time
+import shlex
+import tarfile
+import logging
+import tempfile
+import subprocess
+
+REMOVE_CHUNK = 2000  # token paths per remote rm command
+
+
+class PlacementBackend:
+    """
+    - token_dir: directory the tokens are written to on the target hosts
+    - observe: optional callback observe(host, seconds, ok) after each placement
+    """
+
+    name = 'base'
+
+    def __init__(self, token_dir, observe=None):
+        self.token_dir = token_dir
+        self.observe = observe
+
+    def place(self, target, tokens):
+        raise NotImplementedError
+
+    def remove(self, target, names):
+        raise NotImplementedError
+
+    def report(self, host, start, ok):
+        if self.observe is not None:
+            self.observe(host, time.perf_counter() - start, ok)
+
+    def close(self):
+        pass
+
+
+class AnsibleBackend(PlacementBackend):
+    """Push tokens with one ad-hoc Ansible run per call."""
+
+    name = 'ansible'
+
+    def run(self, target, cmd, observed=True):
+        start = time.perf_counter()
+        ok = False
+        try:
+            subprocess.run(cmd, check=True)
+            ok = True
+        except (subprocess.CalledProcessError, OSError) as e:
+            logging.exception('Ansible %s failed: %s', cmd[3], e)
+        if observed:
+            self.report(target, start, ok)
+        return ok
+
+    def place(self, target, tokens):
+        # private staging directory, so concurrent placements never share a source path
+        with tempfile.TemporaryDirectory(prefix='honey_batch_') as tmpdir:
+            if len(tokens) == 1:
+                token_name, token_content = tokens[0]
+                src = os.path.join(tmpdir, token_name)
+                with open(src, 'w') as fh:
+                    fh.write(token_content)
+                cmd = ['ansible', target, '-m', 'copy', '-a',
+                       f"src={src} dest={self.token_dir}/{token_name} mode=0644"]
+                logging.info('Placing honeytoken %s on %s', token_name, target)
+            else:
+                # one transfer per host regardless of how many tokens are in the batch
+                src = os.path.join(tmpdir, 'tokens.tar.gz')
+                with tarfile.open(src, 'w:gz') as tar:
+                    for token_name, token_content in tokens:
+                        data = token_content.encode('utf-8')
+                        info = tarfile.TarInfo(token_name)
+                        info.size = len(data)
+                        info.mode = 0o644
+                        info.mtime = time.time()
+                        tar.addfile(info, io.BytesIO(data))
+                cmd = ['ansible', target, '-m', 'unarchive', '-a',
+                       f"src={src} dest={self.token_dir}"]
+                logging.info('Placing %d honeytokens on %s', len(tokens), target)
+            return [] if self.run(target, cmd) else [target]
+
+    def remove(self, target, names):
+        # one rm per host, split only to stay well inside the command line limit
+        ok = True
+        for i in range(0, len(names), REMOVE_CHUNK):
+            paths = ' '.join(shlex.quote(f"{self.token_dir}/{name}") for name in names[i:i + REMOVE_CHUNK])
+            cmd = ['ansible', target, '-m', 'shell', '-a', f"rm -f -- {paths}"]
+            ok = self.run(target, cmd, observed=False) and ok
+        logging.info('Removed %d honeytoken(s) from %s', len(names), target)
+        return [] if ok else [target]
+
+
+class SSHBackend(PlacementBackend):
+    """
+    Write tokens over pooled SFTP sessions.
+    - pool_factory: returns the SSHPool; called on first placement so the pool
+      (and paramiko) is only loaded when this backend is actually used
+    """
+
+    name = 'ssh'
+
+    def __init__(self, token_dir, observe=None, pool_factory=None):
+        super().__init__(token_dir, observe)
+        self.pool_factory = pool_factory
+        self.pool = None
+
+    def place(self, target, tokens):
+        if self.pool is None:
+            self.pool = self.pool_factory()
+        files = [(f"{self.token_dir}/{name}", content.encode('utf-8')) for name, content in tokens]
+        logging.info('Placing %d honeytoken(s) on %s via SFTP', len(files), target)
+        failed = self.pool.write(target, files, observe=self.observe)
+        if failed:
+            logging.error('SFTP placement failed on: %s', ', '.join(failed))
+        return failed
+
+    def remove(self, target, names):
+        if self.pool is None:
+            self.pool = self.pool_factory()
+        failed = self.pool.remove(target, [f"{self.token_dir}/{name}" for name in names])
+        logging.info('Removed %d honeytoken(s) from %s via SSH', len(names), target)
+        return failed
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.close()
+            self.pool = None
+
+
+class LocalBackend(PlacementBackend):
+    """
+    Write tokens directly into token_dir on this host.
+    Each file is written to a unique temp name in the same directory and renamed
+    into place, so readers only ever see complete tokens.
+    """
+
+    name = 'local'
+
+    def __init__(self, token_dir, observe=None, mode=0o644):
+        super().__init__(token_dir, observe)
+        self.mode = mode
+        os.makedirs(token_dir, exist_ok=True)
+
+    def place(self, target, tokens):
+        start = time.perf_counter()
+        ok = False
+        try:
+            for token_name, token_content in tokens:
+                fd, tmp = tempfile.mkstemp(prefix='.' + token_name, dir=self.token_dir)
+                try:
+                    with os.fdopen(fd, 'w') as fh:
+                        fh.write(token_content)
+                    os.chmod(tmp, self.mode)
+                    os.replace(tmp, os.path.join(self.token_dir, token_name))
+                except BaseException:
+                    os.unlink(tmp)
+                    raise
+            ok = True
+        except OSError as e:
+            logging.exception('Local placement in %s failed: %s', self.token_dir, e)
+        self.report(target, start, ok)
+        logging.debug('Placed %d honeytoken(s) for %s in %s', len(tokens), target, self.token_dir)
+        return [] if ok else [target]
+
+    def remove(self, target, names):
+        try:
+            for token_name in names:
+                try:
+                    os.unlink(os.path.join(self.token_dir, token_name))
+                except FileNotFoundError:
+                    pass
+        except OSError as e:
+            logging.exception('Local removal in %s failed: %s', self.token_dir, e)
+            return [target]
+        return []
+
+
+class NoopBackend(PlacementBackend):
+    """Accept every placement without writing anything."""
+
+    name = 'noop'
+
+    def place(self, target, tokens):
+        logging.debug('Skipping placement of %d honeytoken(s) on %s (noop backend)',
+                      len(tokens), target)
+        return []
+
+    def remove(self, target, names):
+        return []
+
+
+BACKENDS = {backend.name: backend for backend in (AnsibleBackend, SSHBackend, LocalBackend, NoopBackend)}
+
+
+def make_backend(name, token_dir, observe=None, **options):
+    """Build the placement backend registered as name; options go to its constructor."""
+    try:
+        backend = BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"Unknown placement backend: {name}") from None
+    return backend(token_dir, observe, **options)
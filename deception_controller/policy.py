@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+"""
+Declarative placement policy
+- Rules are read from a JSON or YAML file (YAML needs PyYAML) and compiled once
+  at load time: eventid lists become a dispatch table, usernames a set, src_ip
+  CIDRs integer ranges and command/field patterns precompiled regexes
+- An event is only tested against the rules listed under its eventid (plus the
+  rules that match any eventid), in file order; the first matching rule decides
+- Within an eventid, rules keyed on usernames or src_ip ranges are only tried
+  for those usernames or addresses (the ranges sit in a prefix trie), and the
+  patterns on each field are prescreened with one combined regex, so an event
+  that matches none of them costs one search instead of one per rule
+- Without a policy file every event places a token (the original behaviour)
+
+Policy file format:
+    {
+      "default": "ignore",
+      "rules": [
+        {"name": "downloads", "eventid": ["cowrie.session.file_download"], "action": "place"},
+        {"name": "lab-monitoring", "src_ip": ["10.0.50.0/24"], "action": "ignore"},
+        {"name": "credential-hunting", "eventid": "cowrie.command.input",
+         "command": "(passwd|shadow|id_rsa|\\.aws)", "target": "lab1"}
+      ]
+    }
+Rule keys (all optional; a rule without conditions matches every event):
+- eventid: eventid or list of eventids ('*' or omitted: any)
+- username: username or list of usernames (exact match)
+- src_ip: CIDR or list of CIDRs
+- command: regex searched in the command line (the 'input' field)
+- match: {field: regex} searched in other event fields
+- action: 'place' (default) or 'ignore'
+- target: placement target overriding the src_ip route
+"""
+
+import re
+import json
+import heapq
+import logging
+import ipaddress
+
+from routing import PrefixTrie
+
+try:
+    import yaml
+except ImportError:  # YAML policy files are optional
+    yaml = None
+
+ACTIONS = ('place', 'ignore')
+# numbered or named backreferences would point at the wrong group inside a combined screen
+BACKREF_RE = re.compile(r'\\[1-9]|\(\?P=')
+RULE_KEYS = {'name', 'description', 'eventid', 'username', 'src_ip', 'command', 'match', 'action', 'target'}
+
+
+class PolicyError(ValueError):
+    pass
+
+
+def as_list(value):
+    if value is None:
+        return []
+    if isinstance(value, (list, tuple)):
+        return list(value)
+    return [value]
+
+
+def ip_value(src_ip):
+    """(version, integer) for src_ip, with IPv4-mapped IPv6 folded to IPv4; None if invalid."""
+    try:
+        addr = ipaddress.ip_address(src_ip)
+    except ValueError:
+        return None
+    if addr.version == 6 and addr.ipv4_mapped is not None:
+        addr = addr.ipv4_mapped
+    return addr.version, int(addr)
+
+
+class Rule:
+    """
+    One compiled rule.
+    - checks: predicates check(event, ip) run cheapest first; ip is the
+      ip_value of the event's src_ip, computed only for rules with CIDRs
+    - fields: event fields the checks read
+    - usernames: usernames the rule is limited to (None: any)
+    - networks: src_ip networks the rule is limited to (empty: any)
+    - patterns: {field: regex source} the rule requires, used for prescreening
+    """
+
+    def __init__(self, name, action='place', target=None, eventids=None, checks=(), fields=(),
+                 usernames=None, networks=(), patterns=None):
+        self.name = name
+        self.action = action
+        self.target = target
+        self.eventids = eventids  # None: any eventid
+        self.checks = tuple(checks)
+        self.fields = frozenset(fields)
+        self.needs_ip = 'src_ip' in self.fields
+        self.usernames = usernames
+        self.networks = tuple(networks)
+        self.patterns = patterns or {}
+
+    def matches(self, event, ip=None):
+        for check in self.checks:
+            if not check(event, ip):
+                return False
+        return True
+
+    def __repr__(self):
+        return f'Rule({self.name!r}, {self.action!r})'
+
+
+def compile_rule(spec, index):
+    """Compile one rule mapping from the policy file."""
+    if not isinstance(spec, dict):
+        raise PolicyError(f'rule {index}: expected a mapping, got {type(spec).__name__}')
+    name = str(spec.get('name') or f'rule{index}')
+    unknown = set(spec) - RULE_KEYS
+    if unknown:
+        raise PolicyError(f'rule {name}: unknown keys {", ".join(sorted(unknown))}')
+    action = spec.get('action', 'place')
+    if action not in ACTIONS:
+        raise PolicyError(f'rule {name}: action must be one of {", ".join(ACTIONS)}')
+    eventids = [str(e) for e in as_list(spec.get('eventid'))]
+    eventids = None if not eventids or '*' in eventids else frozenset(eventids)
+    checks = []
+    fields = []
+    usernames = frozenset(str(u) for u in as_list(spec.get('username')))
+    if usernames:
+        checks.append(lambda event, ip: event.get('username') in usernames)
+        fields.append('username')
+    ranges = []
+    networks = []
+    for cidr in as_list(spec.get('src_ip')):
+        try:
+            network = ipaddress.ip_network(cidr, strict=False)
+        except ValueError as e:
+            raise PolicyError(f'rule {name}: {e}') from None
+        networks.append(network)
+        ranges.append((network.version, int(network.network_address), int(network.broadcast_address)))
+    if ranges:
+        checks.append(lambda event, ip: ip is not None and any(
+            ip[0] == version and lo <= ip[1] <= hi for version, lo, hi in ranges))
+        fields.append('src_ip')
+    patterns = dict(spec.get('match') or {})
+    if spec.get('command') is not None:
+        patterns['input'] = spec['command']
+    for field, pattern in patterns.items():
+        try:
+            search = re.compile(pattern).search
+        except (re.error, TypeError) as e:
+            raise PolicyError(f'rule {name}: bad pattern for {field}: {e}') from None
+        checks.append(lambda event, ip, field=field, search=search:
+                      isinstance(event.get(field), str) and search(event[field]) is not None)
+        fields.append(field)
+    return Rule(name, action, spec.get('target'), eventids, checks, fields,
+                usernames or None, networks, {field: str(pattern) for field, pattern in patterns.items()})
+
+
+def screenable(pattern):
+    """Whether pattern keeps its meaning as one branch of a combined alternation."""
+    if BACKREF_RE.search(pattern):
+        return False
+    try:
+        re.compile(f'(?:{pattern})')
+    except re.error:
+        return False  # e.g. global inline flags, only valid at the start of a whole pattern
+    return True
+
+
+class Bucket:
+    """
+    The rules that can match one eventid, in file order, with:
+    - by_username: username -> positions of rules limited to that username
+    - by_network: per address family, a prefix trie of the remaining rules
+      limited to src_ip ranges
+    - unkeyed: positions of the rules keyed on neither
+    - screens: field -> search over the alternation of every rule pattern on
+      that field; a rule screened on a field is skipped when the screen misses
+    """
+
+    def __init__(self, rules):
+        self.rules = tuple(rules)
+        self.needs_ip = any(rule.needs_ip for rule in self.rules)
+        self.by_username = {}
+        self.by_network = None
+        self.unkeyed = []
+        networks = {}
+        for pos, rule in enumerate(self.rules):
+            if rule.usernames is not None:
+                for username in rule.usernames:
+                    self.by_username.setdefault(username, []).append(pos)
+            elif rule.networks:
+                for network in rule.networks:
+                    networks.setdefault(network, []).append(pos)
+            else:
+                self.unkeyed.append(pos)
+        if networks:
+            self.by_network = {4: PrefixTrie(32), 6: PrefixTrie(128)}
+            for network, positions in networks.items():
+                self.by_network[network.version].insert(network, tuple(positions))
+        self.screens = {}
+        self.screen_field = [None] * len(self.rules)
+        by_field = {}
+        for pos, rule in enumerate(self.rules):
+            for field, pattern in rule.patterns.items():
+                if screenable(pattern):
+                    by_field.setdefault(field, []).append(pos)
+                    break
+        for field, positions in by_field.items():
+            if len(positions) < 2:
+                continue
+            try:
+                combined = re.compile('|'.join(f'(?:{self.rules[pos].patterns[field]})' for pos in positions))
+            except re.error:
+                continue  # e.g. clashing group names; check each rule on its own
+            self.screens[field] = combined.search
+            for pos in positions:
+                self.screen_field[pos] = field
+
+    def candidates(self, event, ip):
+        """Positions of the rules that can match event, in file order."""
+        keyed = [self.unkeyed]
+        by_username = self.by_username.get(event.get('username'))
+        if by_username:
+            keyed.append(by_username)
+        if self.by_network is not None and ip is not None:
+            matched = self.by_network[ip[0]].all_matches(ip[1])
+            if matched:
+                keyed.append(sorted({pos for positions in matched for pos in positions}))
+        return keyed[0] if len(keyed) == 1 else heapq.merge(*keyed)
+
+    def evaluate(self, event):
+        ip = ip_value(event.get('src_ip')) if self.needs_ip else None
+        screened = {}
+        for pos in self.candidates(event, ip):
+            field = self.screen_field[pos]
+            if field is not None:
+                hit = screened.get(field)
+                if hit is None:
+                    value = event.get(field)
+                    hit = screened[field] = isinstance(value, str) and self.screens[field](value) is not None
+                if not hit:
+                    continue
+            rule = self.rules[pos]
+            if rule.matches(event, ip):
+                return rule
+        return None
+
+
+class Policy:
+    """
+    Compiled rule set.
+    - evaluate(event) returns the first matching Rule, or the default rule
+    """
+
+    def __init__(self, rules=(), default='place'):
+        if default not in ACTIONS:
+            raise PolicyError(f'default must be one of {", ".join(ACTIONS)}')
+        self.rules = list(rules)
+        self.default = Rule('default', default)
+        any_rules = [rule for rule in self.rules if rule.eventids is None]
+        named = set()
+        for rule in self.rules:
+            named.update(rule.eventids or ())
+        # eventid -> Bucket of the rules that can match it
+        self.table = {eventid: Bucket(rule for rule in self.rules
+                                      if rule.eventids is None or eventid in rule.eventids)
+                      for eventid in named}
+        self.fallback = Bucket(any_rules)
+
+    def evaluate(self, event):
+        return self.table.get(event.get('eventid'), self.fallback).evaluate(event) or self.default
+
+    def fields(self):
+        """Event fields the rules read."""
+        fields = {'eventid'}
+        for rule in self.rules:
+            fields.update(rule.fields)
+        return fields
+
+    def __len__(self):
+        return len(self.rules)
+
+
+def load_policy(path):
+    """Compile the policy file at path (.json, .yml or .yaml)."""
+    with open(path, 'r') as fh:
+        if path.endswith(('.yml', '.yaml')):
+            if yaml is None:
+                raise PolicyError(f'{path}: PyYAML is required for YAML policy files')
+            try:
+                spec = yaml.safe_load(fh)
+            except yaml.YAMLError as e:
+                raise PolicyError(f'{path}: {e}') from None
+        else:
+            try:
+                spec = json.load(fh)
+            except ValueError as e:
+                raise PolicyError(f'{path}: {e}') from None
+    if isinstance(spec, list):
+        spec = {'rules': spec}
+    if not isinstance(spec, dict):
+        raise PolicyError(f'{path}: expected a mapping with a "rules" list')
+    rules = [compile_rule(rule, i) for i, rule in enumerate(spec.get('rules') or [], 1)]
+    names = [rule.name for rule in rules]
+    if len(set(names)) != len(names):
+        raise PolicyError(f'{path}: rule names must be unique')
+    policy = Policy(rules, spec.get('default', 'place'))
+    logging.info('Loaded %d policy rules from %s (%d eventid buckets, default: %s)',
+                 len(policy), path, len(policy.table), policy.default.action)
+    return policy
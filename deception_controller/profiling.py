@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+On-demand profiling of the controller loop
+- cProfile runs only inside sampled loop iterations (every sample_every-th one),
+  never while the loop is idle waiting for events
+- Every interval seconds the collected profile is dumped (.prof for pstats /
+  snakeviz, plus a top-N text summary) and a tracemalloc snapshot is diffed
+  against the previous one (top-N allocation growth by line)
+- Profiling switches itself off after duration seconds, so it can be left on
+  for a short window in production
+"""
+
+import io
+import os
+import time
+import pstats
+import logging
+import cProfile
+import tracemalloc
+from contextlib import contextmanager
+
+# the profiler's own bookkeeping is not interesting in allocation diffs
+SNAPSHOT_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, pstats.__file__),
+    tracemalloc.Filter(False, cProfile.__file__),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+)
+
+
+class LoopProfiler:
+    """
+    - out_dir: where dumps go (created if missing)
+    - interval: seconds per profile dump / allocation diff
+    - duration: seconds after which profiling stops (0 runs until close())
+    - sample_every: profile one loop iteration in this many
+    - top: entries kept in the text summaries
+    - frames: traceback depth stored by tracemalloc (1 keeps its overhead lowest)
+    """
+
+    def __init__(self, out_dir, interval=60, duration=600, sample_every=1, top=25, frames=1,
+                 clock=time.monotonic):
+        self.out_dir = out_dir
+        self.interval = interval
+        self.duration = duration
+        self.sample_every = max(1, sample_every)
+        self.top = top
+        self.clock = clock
+        os.makedirs(out_dir, exist_ok=True)
+        self.profile = cProfile.Profile()
+        self.iterations = 0
+        self.sampled = 0
+        self.started = self.last = clock()
+        self.active = True
+        tracemalloc.start(frames)
+        self.snapshot = tracemalloc.take_snapshot().filter_traces(SNAPSHOT_FILTERS)
+        logging.info('Profiling loop iterations to %s every %ss for %s', out_dir, interval,
+                     f'{duration}s' if duration else 'the life of the process')
+
+    @contextmanager
+    def iteration(self):
+        """Profile the enclosed loop iteration if it is sampled."""
+        self.iterations += 1
+        if not self.active or self.iterations % self.sample_every:
+            yield
+            return
+        self.sampled += 1
+        self.profile.enable()
+        try:
+            yield
+        finally:
+            self.profile.disable()
+
+    def timeout(self, default):
+        if not self.active:
+            return default
+        return max(0.0, min(default, self.last + self.interval - self.clock()))
+
+    def tick(self):
+        """Dump once the interval has elapsed; stop once the duration has."""
+        if not self.active:
+            return
+        now = self.clock()
+        if self.duration and now - self.started >= self.duration:
+            self.close()
+        elif now - self.last >= self.interval:
+            self.dump()
+
+    def dump(self):
+        stamp = time.strftime('%Y%m%dT%H%M%S')
+        base = os.path.join(self.out_dir, f'controller-{stamp}-{os.getpid()}')
+        start = time.perf_counter()
+        try:
+            self.profile.create_stats()
+            if self.profile.stats:
+                self.profile.dump_stats(base + '.prof')
+                text = io.StringIO()
+                pstats.Stats(self.profile, stream=text).sort_stats('cumulative').print_stats(self.top)
+                with open(base + '.txt', 'w') as fh:
+                    fh.write(f'{self.sampled} of {self.iterations} loop iterations profiled\n')
+                    fh.write(text.getvalue())
+            snapshot = tracemalloc.take_snapshot().filter_traces(SNAPSHOT_FILTERS)
+            with open(base + '.alloc.txt', 'w') as fh:
+                current, peak = tracemalloc.get_traced_memory()
+                fh.write(f'traced memory: current {current / 1e6:.1f} MB, peak {peak / 1e6:.1f} MB\n')
+                fh.write(f'top {self.top} allocation changes since the previous snapshot:\n')
+                for stat in snapshot.compare_to(self.snapshot, 'lineno')[:self.top]:
+                    fh.write(f'{stat}\n')
+            self.snapshot = snapshot
+            logging.info('Profile written to %s.* in %.1f ms', base, (time.perf_counter() - start) * 1000)
+        except OSError as e:
+            logging.warning('Profile dump to %s failed: %s', self.out_dir, e)
+        finally:
+            self.profile = cProfile.Profile()
+            self.sampled = self.iterations = 0
+            self.last = self.clock()
+
+    def close(self):
+        """Write the final interval and stop tracing."""
+        if not self.active:
+            return
+        self.dump()
+        self.active = False
+        self.snapshot = None
+        tracemalloc.stop()
+        logging.info('Profiling stopped')
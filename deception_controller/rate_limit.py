@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Token-bucket suppression of honeytoken placements
+- One bucket per src_ip and one per Cowrie session
+- A placement goes ahead only if both buckets have a token; otherwise it is
+  counted as suppressed
+- Bucket tables are LRU-bounded so a scan from many addresses cannot grow memory
+"""
+
+import time
+from collections import OrderedDict
+
+
+class TokenBuckets:
+    """
+    Keyed token buckets.
+    - burst: bucket capacity (tokens available to a new key)
+    - refill: tokens added per second (0 means the burst is all a key ever gets)
+    """
+
+    def __init__(self, burst, refill, max_keys=100000):
+        self.burst = burst
+        self.refill = refill
+        self.max_keys = max_keys
+        self.buckets = OrderedDict()  # key -> [tokens, last refill time]
+
+    def peek(self, key, now):
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            return self.burst
+        return min(self.burst, bucket[0] + (now - bucket[1]) * self.refill)
+
+    def take(self, key, now):
+        tokens = self.peek(key, now) - 1
+        self.buckets[key] = [tokens, now]
+        self.buckets.move_to_end(key)
+        if len(self.buckets) > self.max_keys:
+            self.buckets.popitem(last=False)
+
+
+class PlacementLimiter:
+    """Per-src_ip and per-session rate limit in front of place_honeytoken."""
+
+    def __init__(self, ip_burst=3, ip_refill=1 / 60, session_burst=1, session_refill=0.0,
+                 max_keys=100000, clock=time.time):
+        self.clock = clock
+        self.by_ip = TokenBuckets(ip_burst, ip_refill, max_keys)
+        self.by_session = TokenBuckets(session_burst, session_refill, max_keys)
+        self.allowed = 0
+        self.suppressed = 0
+        self.suppressed_by_ip = 0
+        self.suppressed_by_session = 0
+
+    def allow(self, src_ip, session):
+        return self.check(src_ip, session) is None
+
+    def check(self, src_ip, session):
+        """Like allow(), but returns None or the bucket that suppressed the placement ('ip' or 'session')."""
+        now = self.clock()
+        if self.by_ip.peek(src_ip, now) < 1:
+            self.suppressed += 1
+            self.suppressed_by_ip += 1
+            return 'ip'
+        if session and self.by_session.peek(session, now) < 1:
+            self.suppressed += 1
+            self.suppressed_by_session += 1
+            return 'session'
+        self.by_ip.take(src_ip, now)
+        if session:
+            self.by_session.take(session, now)
+        self.allowed += 1
+        return None
+
+    def stats(self):
+        return {"allowed": self.allowed, "suppressed": self.suppressed,
+                "suppressed_by_ip": self.suppressed_by_ip,
+                "suppressed_by_session": self.suppressed_by_session,
+                "tracked_ips": len(self.by_ip.buckets),
+                "tracked_sessions": len(self.by_session.buckets)}
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Helpers for replaying a recorded Cowrie log through the controller
+- paced() releases events at their recorded spacing divided by a speed multiple
+  (0 replays as fast as possible)
+- ReplayClock reports the timestamp of the event being replayed, so time-based
+  policy (rate limits) behaves as it did when the events were recorded; its
+  scheduled() time is where a paced replay should be, so falling behind shows as lag
+- StageStats collects per-stage latencies and summarizes them as percentiles
+- peak_rss_mb() reads the process memory high-water mark
+"""
+
+import sys
+import time
+import resource
+
+
+class ReplayClock:
+    """Callable clock returning the recorded epoch time of the current event."""
+
+    def __init__(self, now=0.0):
+        self.now = now
+        self.first = None  # recorded time of the first event, set by paced()
+        self.started = None
+        self.speed = 0
+
+    def __call__(self):
+        return self.now
+
+    def scheduled(self):
+        """Recorded time the replay schedule has reached (the current event's time at full speed)."""
+        if self.first is None or self.speed <= 0:
+            return self.now
+        return self.first + (time.perf_counter() - self.started) * self.speed
+
+
+def paced(events, speed, clock, epoch, sleep=time.sleep):
+    """
+    Yield events, advancing clock to each event's timestamp.
+    - speed: replay speed multiple (1 = real time, 100 = 100x); 0 does not sleep
+    - epoch: function turning an event's 'timestamp' into epoch seconds (or None)
+    """
+    first = None
+    start = time.perf_counter()
+    for event in events:
+        ts = epoch(event.get('timestamp'))
+        if ts is not None:
+            clock.now = ts
+            if first is None:
+                first = ts
+                clock.first, clock.started, clock.speed = ts, start, speed
+            if speed > 0:
+                delay = (ts - first) / speed - (time.perf_counter() - start)
+                if delay > 0:
+                    sleep(delay)
+        yield event
+
+
+def percentile(ordered, q):
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class StageStats:
+    """Per-stage latency samples in seconds, e.g. 'parse', 'policy', 'placement', 'audit'."""
+
+    def __init__(self):
+        self.samples = {}
+
+    def add(self, stage, seconds):
+        samples = self.samples.get(stage)
+        if samples is None:
+            samples = self.samples[stage] = []
+        samples.append(seconds)
+
+    def timed(self, stage, iterable):
+        """Yield from iterable, recording the time each item took to produce."""
+        it = iter(iterable)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(it)
+            except StopIteration:
+                return
+            self.add(stage, time.perf_counter() - start)
+            yield item
+
+    def summary(self):
+        """{stage: {count, total, p50, p95, p99, max}} with times in seconds."""
+        out = {}
+        for stage, samples in self.samples.items():
+            ordered = sorted(samples)
+            out[stage] = {"count": len(ordered), "total": sum(ordered),
+                          "p50": percentile(ordered, 0.50), "p95": percentile(ordered, 0.95),
+                          "p99": percentile(ordered, 0.99), "max": ordered[-1]}
+        return out
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MiB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
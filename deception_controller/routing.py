@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+src_ip -> placement target routing
+- Longest-prefix match over a binary trie (one per address family), so a lookup
+  costs at most 32 (IPv4) or 128 (IPv6) steps however many ranges are loaded
+- Routes come from the Ansible inventory (each host's ansible_host routes to that
+  host) and an optional CIDR mapping file
+- Recent lookups are cached in an LRU
+
+Mapping file format, one route per line ('#' starts a comment):
+    192.168.53.0/24   lab_hosts
+    10.0.50.10/32     lab1
+    10.0.60.0/24      host1,host2
+"""
+
+import logging
+import ipaddress
+from functools import lru_cache
+
+from ssh_pool import parse_inventory
+
+
+class PrefixTrie:
+    """Binary trie keyed by network prefixes; each node is [child0, child1, value]."""
+
+    def __init__(self, bits):
+        self.bits = bits
+        self.root = [None, None, None]
+        self.size = 0
+
+    def insert(self, network, value):
+        node = self.root
+        addr = int(network.network_address)
+        for i in range(network.prefixlen):
+            bit = (addr >> (self.bits - 1 - i)) & 1
+            if node[bit] is None:
+                node[bit] = [None, None, None]
+            node = node[bit]
+        if node[2] is None:
+            self.size += 1
+        node[2] = value
+
+    def longest_match(self, addr):
+        node = self.root
+        best = node[2]
+        for i in range(self.bits):
+            node = node[(addr >> (self.bits - 1 - i)) & 1]
+            if node is None:
+                break
+            if node[2] is not None:
+                best = node[2]
+        return best
+
+    def all_matches(self, addr):
+        """Values of every prefix containing addr, shortest prefix first."""
+        node = self.root
+        found = [node[2]] if node[2] is not None else []
+        for i in range(self.bits):
+            node = node[(addr >> (self.bits - 1 - i)) & 1]
+            if node is None:
+                break
+            if node[2] is not None:
+                found.append(node[2])
+        return found
+
+
+class RoutingTable:
+    """
+    - default: target returned when no route matches (e.g. 'lab_hosts')
+    - cache_size: number of recent src_ip lookups kept in the LRU
+    Targets are Ansible host patterns; several targets are joined with ':'.
+    """
+
+    def __init__(self, default='lab_hosts', cache_size=4096):
+        self.default = default
+        self.tries = {4: PrefixTrie(32), 6: PrefixTrie(128)}
+        self.lookup = lru_cache(maxsize=cache_size)(self._lookup)
+
+    def add(self, cidr, targets):
+        network = ipaddress.ip_network(cidr, strict=False)
+        if isinstance(targets, str):
+            targets = [targets]
+        self.tries[network.version].insert(network, ':'.join(targets))
+        self.lookup.cache_clear()
+
+    def _lookup(self, src_ip):
+        try:
+            addr = ipaddress.ip_address(src_ip)
+        except ValueError:
+            return self.default
+        if addr.version == 6 and addr.ipv4_mapped is not None:
+            addr = addr.ipv4_mapped
+        return self.tries[addr.version].longest_match(int(addr)) or self.default
+
+    def load_inventory(self, path):
+        """Route each inventory host's own address to that host."""
+        hosts, _ = parse_inventory(path)
+        for name, host_vars in hosts.items():
+            address = host_vars.get('ansible_host', name)
+            try:
+                self.add(address, name)
+            except ValueError:
+                continue  # DNS names cannot be routed by prefix
+
+    def load_routes(self, path):
+        with open(path, 'r') as fh:
+            for lineno, raw in enumerate(fh, 1):
+                line = raw.split('#', 1)[0].strip()
+                if not line:
+                    continue
+                parts = line.split()
+                if len(parts) != 2:
+                    logging.warning('%s:%d: expected "<cidr> <target>[,<target>]"', path, lineno)
+                    continue
+                try:
+                    self.add(parts[0], parts[1].split(','))
+                except ValueError as e:
+                    logging.warning('%s:%d: %s', path, lineno, e)
+
+    def __len__(self):
+        return sum(trie.size for trie in self.tries.values())
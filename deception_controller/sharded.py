@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+Multi-process controller sharded by src_ip
+- The ingest process numbers every event and routes it to one of N worker
+  processes by a stable hash of src_ip, so each attacker's dedup and
+  rate-limit state lives in exactly one worker
+- Workers process chunks of events and return the audit records they produced,
+  plus a status (shedding state, counter increments) that ingest reports
+- A collector thread merges audit records back into ingest order: a record is
+  released once every shard has acknowledged all events up to its sequence number
+- Checkpoints are taken once every routed event has been acknowledged and audited:
+  each worker saves its own dedup/rate-limit state, then ingest saves the read positions
+"""
+
+import time
+import zlib
+import queue
+import heapq
+import logging
+import threading
+import multiprocessing
+from collections import deque
+
+SHUTDOWN_TIMEOUT = 10  # seconds to wait for a worker's queue on shutdown
+SEND_POLL = 1.0  # seconds between liveness checks while a worker's queue is full
+SETTLE_POLL = 0.05  # seconds between checks while waiting for every event to be acknowledged
+CHECKPOINT = 'checkpoint'  # inbox message: save your state
+
+
+class ShardError(RuntimeError):
+    pass
+
+
+def shard_of(src_ip, shards):
+    return zlib.crc32(str(src_ip).encode('utf-8')) % shards
+
+
+class ShardedController:
+    """
+    - worker(shard, inbox, outbox): process target run in each shard. It reads
+      lists of (seq, event) from inbox until None, and for every list puts
+      (shard, last_seq, [(seq, audit), ...], status) on outbox; it ends with
+      (shard, None, [], status). status is passed to run()'s report(shard, status).
+      The CHECKPOINT message asks it to save its state; it needs no reply
+    - shards: number of worker processes
+    - chunk_size: events per message to a worker (amortizes pickling)
+    - queue_chunks: bound on chunks queued per worker before ingest blocks
+    """
+
+    def __init__(self, worker, shards, chunk_size=500, queue_chunks=64):
+        self.worker = worker
+        self.shards = max(1, shards)
+        self.chunk_size = max(1, chunk_size)
+        self.queue_chunks = queue_chunks
+        self.lock = threading.Lock()
+        self.buffers = [[] for _ in range(self.shards)]
+        self.inflight = [deque() for _ in range(self.shards)]  # (first_seq, last_seq, size) per chunk
+        self.heap = []
+        self.seq = 0
+        self.releasing = 0  # released audit records being written by the collector
+        self.finished = set()
+
+    def depth(self):
+        """Events buffered or sent to a worker but not yet acknowledged."""
+        with self.lock:
+            buffered = sum(len(b) for b in self.buffers)
+            inflight = sum(size for chunks in self.inflight for _, _, size in chunks)
+        return buffered + inflight
+
+    def run(self, scan, wait, audit, flush_audit=None, checkpoint=None, report=None):
+        """
+        Ingest until interrupted; audit(entries) is called with records in ingest order.
+        - report(shard, status): optional, called from the collector thread with each ack's status
+        - scan(flush=False): new events; flush also releases events held back for merging
+        - checkpoint: optional Checkpointer of the read positions; when it is due, and on a
+          clean shutdown, ingest settles, has each worker save its state, then saves
+        """
+        self.audit = audit
+        self.flush_audit = flush_audit
+        self.report = report
+        self.inboxes = [multiprocessing.Queue(self.queue_chunks) for _ in range(self.shards)]
+        self.outbox = multiprocessing.Queue()
+        self.procs = [multiprocessing.Process(target=self.worker, name=f'shard-{i}',
+                                              args=(i, self.inboxes[i], self.outbox), daemon=True)
+                      for i in range(self.shards)]
+        for proc in self.procs:
+            proc.start()
+        collector = threading.Thread(target=self.collect, name='audit-merge', daemon=True)
+        collector.start()
+        try:
+            while True:
+                due = checkpoint is not None and checkpoint.due()
+                for event in scan(flush=True) if due else scan():
+                    self.route(event)
+                for shard in range(self.shards):
+                    self.send(shard)
+                if due:
+                    # positions may only cover events whose placements and audits are done
+                    self.settle()
+                    for inbox in self.inboxes:
+                        inbox.put(CHECKPOINT)
+                    checkpoint.save()
+                wait()
+        finally:
+            if checkpoint is not None:
+                for event in scan(flush=True):
+                    self.route(event)
+            # hand over what is buffered, then let each worker drain, save its state and exit
+            for shard in range(self.shards):
+                try:
+                    self.send(shard, timeout=SHUTDOWN_TIMEOUT)
+                    self.inboxes[shard].put(None, timeout=SHUTDOWN_TIMEOUT)
+                except queue.Full:
+                    logging.error('Shard %d is not draining; abandoning its queue', shard)
+                except ShardError as e:
+                    logging.error('%s; abandoning its queue', e)
+            collector.join()
+            for proc in self.procs:
+                proc.join(SHUTDOWN_TIMEOUT)
+            if checkpoint is not None and len(self.finished) == self.shards:
+                checkpoint.save()
+
+    def route(self, event):
+        shard = shard_of(event.get('src_ip'), self.shards)
+        with self.lock:
+            self.seq += 1
+            self.buffers[shard].append((self.seq, event))
+            full = len(self.buffers[shard]) >= self.chunk_size
+        if full:
+            self.send(shard)
+
+    def send(self, shard, timeout=None):
+        """
+        Hand shard's buffered events to its worker. Raises ShardError if the worker
+        has exited and queue.Full if its queue stays full for timeout seconds.
+        """
+        self.check(shard)
+        with self.lock:
+            chunk = self.buffers[shard]
+            if not chunk:
+                return
+            self.buffers[shard] = []
+            self.inflight[shard].append((chunk[0][0], chunk[-1][0], len(chunk)))
+        # may block when the worker is behind; that is the backpressure on ingest,
+        # but only for as long as the worker is still there to take the chunk
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = SEND_POLL if deadline is None else min(SEND_POLL, max(0.0, deadline - time.monotonic()))
+            try:
+                self.inboxes[shard].put(chunk, timeout=wait)
+                return
+            except queue.Full:
+                if deadline is not None and time.monotonic() >= deadline:
+                    raise
+            self.check(shard)
+
+    def settle(self):
+        """Block until every routed event is acknowledged and its audit records are written."""
+        while True:
+            with self.lock:
+                if not (any(self.buffers) or any(self.inflight) or self.heap or self.releasing):
+                    return
+            for shard in range(self.shards):
+                self.check(shard)
+            time.sleep(SETTLE_POLL)
+
+    def check(self, shard):
+        proc = self.procs[shard]
+        if not proc.is_alive():
+            raise ShardError(f'Shard {shard} worker (pid {proc.pid}) exited with code {proc.exitcode}')
+
+    def collect(self):
+        finished = self.finished
+        while len(finished) < self.shards:
+            try:
+                shard, last_seq, audits, status = self.outbox.get(timeout=1)
+            except queue.Empty:
+                if not any(proc.is_alive() for i, proc in enumerate(self.procs) if i not in finished):
+                    logging.error('Shard workers %s exited before acknowledging their work',
+                                  ', '.join(str(i) for i in range(self.shards) if i not in finished))
+                    break
+                continue
+            if self.report is not None:
+                self.report(shard, status)
+            if last_seq is None:
+                finished.add(shard)
+                continue
+            with self.lock:
+                for item in audits:
+                    heapq.heappush(self.heap, item)
+                inflight = self.inflight[shard]
+                while inflight and inflight[0][1] <= last_seq:
+                    inflight.popleft()
+                ready = self.release()
+                if ready:
+                    self.releasing += 1
+            if ready:
+                try:
+                    self.audit(ready)
+                    if self.flush_audit is not None:
+                        self.flush_audit()
+                finally:
+                    with self.lock:
+                        self.releasing -= 1
+        with self.lock:
+            ready = [heapq.heappop(self.heap)[1] for _ in range(len(self.heap))]
+        if ready:
+            self.audit(ready)
+
+    def release(self):
+        """Pop audit records no shard can still precede; caller holds the lock."""
+        bound = self.seq
+        for shard in range(self.shards):
+            if self.inflight[shard]:
+                bound = min(bound, self.inflight[shard][0][0] - 1)
+            elif self.buffers[shard]:
+                bound = min(bound, self.buffers[shard][0][0] - 1)
+        ready = []
+        while self.heap and self.heap[0][0] <= bound:
+            ready.append(heapq.heappop(self.heap)[1])
+        return ready
+
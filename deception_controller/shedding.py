@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Load shedding for event floods
+- The controller is overloaded when events reach the policy stage more than
+  max_lag seconds after Cowrie logged them, or when more than max_depth events
+  and placements are queued inside it; it recovers once lag falls to resume_lag
+  and the queues to half of max_depth, or once the event source has been read
+  to the end; either way not before it has shed for hold seconds (hysteresis,
+  so a flood that shedding keeps up with does not flap in and out of the state)
+- While shedding, events the policy would place a token for are handled by mode:
+  - drop: events whose eventid priority is below min_priority are discarded
+  - coalesce: one placement per src_ip per coalesce_window; the rest are folded into it
+  - audit: no placements at all; each event is only recorded in the audit log
+- State changes are logged with the lag/depth that caused them and the totals shed
+"""
+
+import time
+import logging
+import threading
+from collections import OrderedDict
+
+from cowrie_parse import event_epoch
+
+MODES = ('off', 'drop', 'coalesce', 'audit')
+# Higher is more valuable; eventids not listed get priority 1
+DEFAULT_PRIORITIES = {
+    "cowrie.session.connect": 0,
+    "cowrie.login.failed": 0,
+    "cowrie.login.success": 2,
+    "cowrie.command.input": 2,
+    "cowrie.session.file_download": 3,
+    "cowrie.session.file_upload": 3,
+}
+
+
+def parse_priorities(spec):
+    """'eventid=priority,...' -> dict, on top of DEFAULT_PRIORITIES."""
+    priorities = dict(DEFAULT_PRIORITIES)
+    for item in filter(None, (part.strip() for part in spec.split(','))):
+        eventid, _, priority = item.partition('=')
+        priorities[eventid.strip()] = int(priority)
+    return priorities
+
+
+class LoadShedder:
+    """
+    - mode: 'off', 'drop', 'coalesce' or 'audit' (see module docstring)
+    - max_lag / resume_lag: seconds of event lag that start / end shedding
+    - max_depth: queued events and placements that start shedding (0: ignore depth)
+    - depth: callable returning that queue depth, sampled every check_interval seconds
+    - priorities / min_priority: drop mode keeps events with priority >= min_priority
+    - coalesce_window: seconds a src_ip's placement stands in for its later events
+    - max_sources: src_ips remembered for coalescing (least recently placed are forgotten)
+    - hold: minimum seconds spent shedding once started
+    """
+
+    def __init__(self, mode='coalesce', max_lag=60.0, resume_lag=10.0, max_depth=0, depth=None,
+                 priorities=None, min_priority=2, coalesce_window=300.0, max_sources=100000,
+                 hold=30.0, check_interval=0.5, clock=time.time):
+        if mode not in MODES:
+            raise ValueError(f"Unknown shedding mode: {mode}")
+        self.mode = mode
+        self.max_lag = max_lag
+        self.resume_lag = min(resume_lag, max_lag)
+        self.max_depth = max_depth
+        self.depth = depth
+        self.priorities = DEFAULT_PRIORITIES if priorities is None else priorities
+        self.min_priority = min_priority
+        self.coalesce_window = coalesce_window
+        self.max_sources = max_sources
+        self.hold = hold
+        self.check_interval = check_interval
+        self.clock = clock
+        self.shedding = False
+        self.since = None
+        self.lag = 0.0
+        self.queued = 0
+        self.checked = float('-inf')
+        self.placed_at = OrderedDict()  # src_ip -> clock time of its last placement while shedding
+        self.counts = {'dropped': 0, 'coalesced': 0, 'audit_only': 0}
+        self.episode = dict(self.counts)
+        self.episodes = 0
+        self.lock = threading.Lock()
+
+    def update(self, event):
+        """Track lag from event's timestamp and queue depth; enter or leave the shedding state."""
+        now = self.clock()
+        ts = event_epoch(event.get('timestamp'))
+        if ts is not None:
+            self.lag = now - ts
+        if self.depth is not None and self.max_depth and now - self.checked >= self.check_interval:
+            self.checked = now
+            self.queued = self.depth()
+        if not self.shedding:
+            if self.lag > self.max_lag or (self.max_depth and self.queued > self.max_depth):
+                self.start(now)
+        elif (now - self.since >= self.hold and self.lag <= self.resume_lag
+              and (not self.max_depth or self.queued <= self.max_depth // 2)):
+            self.stop(now)
+
+    def start(self, now):
+        self.shedding = True
+        self.since = now
+        self.episodes += 1
+        self.episode = dict.fromkeys(self.counts, 0)
+        logging.warning('Overloaded (event lag %.1fs, %d queued): shedding load in %s mode',
+                        self.lag, self.queued, self.mode)
+
+    def stop(self, now):
+        self.shedding = False
+        self.placed_at.clear()
+        logging.warning('Caught up (event lag %.1fs, %d queued): stopped shedding after %.1fs; %s',
+                        self.lag, self.queued, now - self.since,
+                        ', '.join(f'{n} {action}' for action, n in self.episode.items()))
+        self.since = None
+
+    def admit(self, event):
+        """
+        Decide how to handle an event the policy would place a token for.
+        Returns None to place it normally, or the action taken instead:
+        'dropped', 'coalesced' or 'audit_only'.
+        """
+        if self.mode == 'off':
+            return None
+        with self.lock:
+            self.update(event)
+            if not self.shedding:
+                return None
+            return self.shed(event)
+
+    def shed(self, event):
+        if self.mode == 'audit':
+            return self.count('audit_only')
+        if self.mode == 'drop':
+            if self.priorities.get(event.get('eventid'), 1) < self.min_priority:
+                return self.count('dropped')
+            return None
+        src_ip = event.get('src_ip')
+        now = self.clock()
+        last = self.placed_at.get(src_ip)
+        if last is not None and now - last < self.coalesce_window:
+            return self.count('coalesced')
+        self.placed_at[src_ip] = now
+        self.placed_at.move_to_end(src_ip)
+        if len(self.placed_at) > self.max_sources:
+            self.placed_at.popitem(last=False)
+        return None
+
+    def idle(self):
+        """The event source has been read to the end: stop shedding unless the queues are still full."""
+        with self.lock:
+            now = self.clock()
+            if not self.shedding or now - self.since < self.hold:
+                return
+            if self.depth is not None and self.max_depth:
+                self.queued = self.depth()
+                if self.queued > self.max_depth // 2:
+                    return
+            self.stop(now)
+
+    def count(self, action):
+        self.counts[action] += 1
+        self.episode[action] += 1
+        return action
+
+    def stats(self):
+        return {"mode": self.mode, "shedding": self.shedding, "lag": round(self.lag, 3),
+                "queued": self.queued, "episodes": self.episodes, **self.counts}
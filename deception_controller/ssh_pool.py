@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+In-process SSH/SFTP transport for honeytoken delivery
+- Parses the Ansible INI inventory (groups, host vars, group vars, children)
+- Keeps one long-lived SSH connection and SFTP channel per host
+- Health-checks idle connections before use and reconnects on failure
+
+Requires paramiko (pip3 install paramiko), the same dependency as scripts/run_ssh_probe.py.
+"""
+
+import os
+import time
+import shlex
+import logging
+import threading
+
+from placement import REMOVE_CHUNK
+
+
+def parse_inventory(path):
+    """
+    Parse an Ansible INI inventory.
+    Returns (hosts, groups):
+    - hosts: host name -> dict of variables (group vars merged under host vars)
+    - groups: group name -> list of host names, with :children expanded and 'all' added
+    """
+    hosts = {}
+    members = {}
+    children = {}
+    group_vars = {}
+    section, kind = 'ungrouped', 'hosts'
+    with open(path, 'r') as fh:
+        for raw in fh:
+            line = raw.strip()
+            if not line or line[0] in '#;':
+                continue
+            if line.startswith('[') and line.endswith(']'):
+                section, _, kind = line[1:-1].partition(':')
+                kind = kind or 'hosts'
+                continue
+            # drop trailing '# comment' the way Ansible does for INI values
+            tokens = shlex.split(line, comments=True)
+            if not tokens:
+                continue
+            if kind == 'vars':
+                key, _, value = line.partition('=')
+                value = shlex.split(value, comments=True)
+                group_vars.setdefault(section, {})[key.strip()] = value[0] if value else ''
+            elif kind == 'children':
+                children.setdefault(section, []).append(tokens[0])
+            else:
+                name = tokens[0]
+                host = hosts.setdefault(name, {})
+                for token in tokens[1:]:
+                    key, _, value = token.partition('=')
+                    host[key] = value
+                members.setdefault(section, []).append(name)
+
+    def expand(group, seen=()):
+        names = list(members.get(group, []))
+        for child in children.get(group, []):
+            if child not in seen:
+                names.extend(expand(child, seen + (group,)))
+        return names
+
+    groups = {g: list(dict.fromkeys(expand(g))) for g in set(members) | set(children)}
+    groups['all'] = list(hosts)
+    for name, host_vars in hosts.items():
+        merged = dict(group_vars.get('all', {}))
+        for group, names in groups.items():
+            if group != 'all' and name in names:
+                merged.update(group_vars.get(group, {}))
+        merged.update(host_vars)
+        hosts[name] = merged
+    return hosts, groups
+
+
+class PooledConnection:
+    """One SSH transport plus SFTP channel to a single inventory host."""
+
+    def __init__(self, name, host_vars, connect_timeout=10):
+        self.name = name
+        self.vars = host_vars
+        self.connect_timeout = connect_timeout
+        self.client = None
+        self.sftp = None
+        self.last_used = 0.0
+        self.lock = threading.Lock()
+
+    def connect(self):
+        import paramiko  # optional dependency, only needed for the ssh transport
+        self.close()
+        v = self.vars
+        client = paramiko.SSHClient()
+        client.load_system_host_keys()
+        common_args = v.get('ansible_ssh_common_args', '') + v.get('ansible_ssh_extra_args', '')
+        if 'StrictHostKeyChecking=no' in common_args:
+            client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+        key_file = v.get('ansible_ssh_private_key_file') or v.get('ansible_private_key_file')
+        client.connect(hostname=v.get('ansible_host', self.name),
+                       port=int(v.get('ansible_port', 22)),
+                       username=v.get('ansible_user'),
+                       password=v.get('ansible_password') or v.get('ansible_ssh_pass'),
+                       key_filename=os.path.expanduser(key_file) if key_file else None,
+                       timeout=self.connect_timeout)
+        client.get_transport().set_keepalive(30)
+        self.client = client
+        self.sftp = client.open_sftp()
+        self.last_used = time.monotonic()
+        logging.info('Opened SSH session to %s', self.name)
+
+    def healthy(self, idle_check):
+        if self.client is None or self.sftp is None:
+            return False
+        transport = self.client.get_transport()
+        if transport is None or not transport.is_active():
+            return False
+        if time.monotonic() - self.last_used > idle_check:
+            try:
+                self.sftp.stat('.')
+            except Exception:
+                return False
+        return True
+
+    def close(self):
+        for obj in (self.sftp, self.client):
+            if obj is not None:
+                try:
+                    obj.close()
+                except Exception:
+                    pass
+        self.client = None
+        self.sftp = None
+
+
+class SSHPool:
+    """
+    Long-lived SFTP sessions keyed by inventory host.
+    - write(target, files) and remove(target, paths) accept a host or group name
+    - connections idle for more than idle_check seconds are probed before use
+    - a failed operation reconnects once and retries
+    """
+
+    def __init__(self, hosts, groups, connect_timeout=10, idle_check=60):
+        self.hosts = hosts
+        self.groups = groups
+        self.connect_timeout = connect_timeout
+        self.idle_check = idle_check
+        self.connections = {}
+
+    @classmethod
+    def from_inventory(cls, path, **kwargs):
+        hosts, groups = parse_inventory(path)
+        return cls(hosts, groups, **kwargs)
+
+    def resolve(self, target):
+        """Host names for a host, a group, or an Ansible 'a:b' union of them."""
+        names = []
+        for part in target.split(':'):
+            if part in self.groups:
+                names.extend(self.groups[part])
+            elif part in self.hosts:
+                names.append(part)
+            else:
+                raise KeyError(f"Unknown inventory host or group: {part}")
+        return list(dict.fromkeys(names))
+
+    def connection(self, name):
+        conn = self.connections.get(name)
+        if conn is None:
+            conn = self.connections.setdefault(
+                name, PooledConnection(name, self.hosts[name], self.connect_timeout))
+        return conn
+
+    def with_host(self, name, action):
+        """Run action(conn) on one host's pooled connection, reconnecting and retrying once."""
+        conn = self.connection(name)
+        # one operation per host at a time; concurrent callers for other hosts are unaffected
+        with conn.lock:
+            for attempt in (1, 2):
+                try:
+                    if not conn.healthy(self.idle_check):
+                        conn.connect()
+                    action(conn)
+                    conn.last_used = time.monotonic()
+                    return
+                except Exception as e:
+                    conn.close()
+                    if attempt == 2:
+                        raise
+                    logging.warning('SSH operation on %s failed (%s); reconnecting', name, e)
+
+    def write_host(self, name, files):
+        """Write [(remote_path, bytes)] to one host over its pooled SFTP channel."""
+        def write(conn):
+            for remote_path, data in files:
+                tmp_path = remote_path + '.tmp'
+                with conn.sftp.open(tmp_path, 'wb') as fh:
+                    fh.write(data)
+                conn.sftp.chmod(tmp_path, 0o644)
+                conn.sftp.posix_rename(tmp_path, remote_path)
+        self.with_host(name, write)
+
+    def remove_host(self, name, paths):
+        """
+        Delete remote paths on one host over the pooled session: one rm per
+        REMOVE_CHUNK paths, so a large sweep stays inside the command line limit.
+        """
+        def remove(conn):
+            for i in range(0, len(paths), REMOVE_CHUNK):
+                cmd = 'rm -f -- ' + ' '.join(shlex.quote(path) for path in paths[i:i + REMOVE_CHUNK])
+                _, stdout, stderr = conn.client.exec_command(cmd, timeout=self.connect_timeout * 6)
+                status = stdout.channel.recv_exit_status()
+                if status:
+                    raise RuntimeError(f"rm exited with {status}: {stderr.read().decode('utf-8', 'replace').strip()}")
+        self.with_host(name, remove)
+
+    def each_host(self, target, what, fn, observe=None):
+        try:
+            names = self.resolve(target)
+        except KeyError as e:
+            # same contract as the Ansible backend: an unusable target is a failed target
+            logging.error('%s on %s failed: %s', what, target, e.args[0])
+            return [target]
+        failed = []
+        for name in names:
+            start = time.perf_counter()
+            ok = True
+            try:
+                fn(name)
+            except Exception as e:
+                logging.exception('%s on %s failed: %s', what, name, e)
+                failed.append(name)
+                ok = False
+            if observe is not None:
+                observe(name, time.perf_counter() - start, ok)
+        return failed
+
+    def write(self, target, files, observe=None):
+        """
+        Write files to every host in target; returns the names of hosts that failed.
+        - observe: optional callback observe(host, seconds, ok) after each host
+        """
+        return self.each_host(target, 'SFTP placement', lambda name: self.write_host(name, files), observe)
+
+    def remove(self, target, paths, observe=None):
+        """Delete paths on every host in target; returns the names of hosts that failed."""
+        return self.each_host(target, 'SSH removal', lambda name: self.remove_host(name, paths), observe)
+
+    def close(self):
+        for conn in self.connections.values():
+            conn.close()
+        self.connections.clear()
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Detection of honeytoken names in attacker input
+- An Aho-Corasick automaton over the live token names finds every name that
+  occurs in a command line or download URL in one pass over the text, however
+  many tokens are live
+- Names added since the last build are checked with plain substring tests from
+  a small pending set; once it reaches pending_max names (or enough names have
+  been retired) a new automaton is built in the background and swapped in, so
+  the lookup cost stays one automaton pass plus at most ~pending_max substring
+  tests and rebuilds never stall the caller
+- Thread-safe: tokens are added from the audit path while ingest scans events
+"""
+
+import threading
+from collections import deque
+
+
+def build_automaton(names):
+    """
+    Return (goto, fail, output) for names.
+    - goto[state]: dict char -> next state (trie edges)
+    - fail[state]: state for the longest proper suffix that is also in the trie
+    - output[state]: tuple of names ending at state (including via failure links)
+    """
+    goto = [{}]
+    output = [()]
+    for name in names:
+        state = 0
+        for ch in name:
+            nxt = goto[state].get(ch)
+            if nxt is None:
+                nxt = len(goto)
+                goto[state][ch] = nxt
+                goto.append({})
+                output.append(())
+            state = nxt
+        output[state] = (name,)
+    fail = [0] * len(goto)
+    order = deque(goto[0].values())
+    while order:
+        state = order.popleft()
+        for ch, nxt in goto[state].items():
+            order.append(nxt)
+            f = fail[state]
+            while f and ch not in goto[f]:
+                f = fail[f]
+            fallback = goto[f].get(ch, 0)
+            fail[nxt] = fallback if fallback != nxt else 0
+            if output[fail[nxt]]:
+                output[nxt] = output[nxt] + output[fail[nxt]]
+    return goto, fail, output
+
+
+class TokenMatcher:
+    """
+    Find live token names inside arbitrary text.
+    - pending_max: names matched by substring test before a rebuild is started
+    - background: rebuild in a daemon thread so adds never stall on a large build
+    """
+
+    def __init__(self, names=(), pending_max=256, background=True):
+        self.pending_max = pending_max
+        self.background = background
+        self.live = set()
+        self.pending = set()
+        self.retired = 0  # names still in the automaton but no longer live
+        self.builds = 0
+        self.building = False
+        self.lock = threading.Lock()
+        self.automaton = build_automaton(())
+        self.add_many(names)
+
+    def add(self, name):
+        self.add_many((name,))
+
+    def add_many(self, names):
+        with self.lock:
+            for name in names:
+                if name and name not in self.live:
+                    self.live.add(name)
+                    self.pending.add(name)
+            start = self.stale() and not self.building
+            if start:
+                self.building = True
+        if start:
+            self.start_rebuild()
+
+    def retire(self, name):
+        with self.lock:
+            if name not in self.live:
+                return
+            self.live.discard(name)
+            if name in self.pending:
+                self.pending.discard(name)
+                return
+            self.retired += 1
+            start = self.stale() and not self.building
+            if start:
+                self.building = True
+        if start:
+            self.start_rebuild()
+
+    def start_rebuild(self):
+        if self.background:
+            threading.Thread(target=self.rebuild, name='token-automaton', daemon=True).start()
+        else:
+            self.rebuild()
+
+    def stale(self):
+        return (len(self.pending) >= self.pending_max
+                or self.retired > max(self.pending_max, len(self.live)))
+
+    def rebuild(self):
+        """Build fresh automatons over the live names and swap them in until none is stale."""
+        with self.lock:
+            self.building = True
+        try:
+            while True:
+                with self.lock:
+                    names = list(self.live)
+                    folded = set(self.pending)
+                automaton = build_automaton(names)
+                with self.lock:
+                    self.automaton = automaton
+                    # names added or retired while building stay pending / retired;
+                    # a fresh set, since iterating a drained set still walks its old table
+                    self.pending = self.pending - folded
+                    self.retired = len(set(names) - self.live)
+                    self.builds += 1
+                    if not self.stale():
+                        return
+        finally:
+            with self.lock:
+                self.building = False
+
+    def find(self, text):
+        """Return the set of live token names occurring in text."""
+        if not text:
+            return set()
+        with self.lock:
+            goto, fail, output = self.automaton
+            found = set()
+            state = 0
+            for ch in text:
+                while state and ch not in goto[state]:
+                    state = fail[state]
+                state = goto[state].get(ch, 0)
+                if output[state]:
+                    found.update(output[state])
+            if self.retired:
+                found &= self.live
+            found.update(name for name in self.pending if name in text)
+        return found
+
+    def names(self):
+        with self.lock:
+            return list(self.live)
+
+    def __len__(self):
+        return len(self.live)
+
+    def stats(self):
+        with self.lock:
+            return {"live": len(self.live), "pending": len(self.pending),
+                    "retired": self.retired, "builds": self.builds,
+                    "states": len(self.automaton[0])}
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+SQLite registry of placed honeytokens
+- One row per token: target host/group, attacker src_ip, session, username,
+  reason, creation time, lifecycle state and trip counters
+- Indexed on src_ip, host, created_at and state, so per-attacker and per-host
+  lookups stay cheap with hundreds of thousands of tokens
+- Tokens placed for a Cowrie event carry that event's dedup key, so a controller
+  that re-reads events after a crash can tell which of them already have a token;
+  trips are keyed the same way, so re-reading an event never counts its trip twice
+- WAL journal with synchronous=NORMAL: readers (scoring, analysis) never block
+  the controller, and a commit costs no fsync until the WAL is checkpointed
+- Thread-safe; the controller writes from its ingest and audit paths
+
+Token filenames carry no metadata; use the registry to recover it.
+"""
+
+import os
+import re
+import time
+import sqlite3
+import threading
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tokens (
+    name            TEXT PRIMARY KEY,
+    host            TEXT,
+    src_ip          TEXT,
+    session         TEXT,
+    username        TEXT,
+    reason          TEXT,
+    created_at      REAL NOT NULL,
+    state           TEXT NOT NULL DEFAULT 'live',
+    state_changed_at REAL,
+    trips           INTEGER NOT NULL DEFAULT 0,
+    first_tripped_at REAL,
+    last_tripped_at REAL,
+    event_key       INTEGER
+);
+CREATE INDEX IF NOT EXISTS tokens_src_ip ON tokens (src_ip);
+CREATE INDEX IF NOT EXISTS tokens_host ON tokens (host);
+CREATE INDEX IF NOT EXISTS tokens_created_at ON tokens (created_at);
+CREATE INDEX IF NOT EXISTS tokens_state ON tokens (state);
+CREATE INDEX IF NOT EXISTS tokens_state_created_at ON tokens (state, created_at);
+CREATE INDEX IF NOT EXISTS tokens_host_state_created_at ON tokens (host, state, created_at);
+CREATE TABLE IF NOT EXISTS trips (
+    token           TEXT NOT NULL,
+    event_key       INTEGER NOT NULL,
+    tripped_at      REAL NOT NULL,
+    PRIMARY KEY (token, event_key)
+);
+"""
+# created after the migration below, which adds event_key to registries that predate it
+EVENT_KEY_INDEX = "CREATE INDEX IF NOT EXISTS tokens_event_key ON tokens (event_key);"
+
+# honey_1765344472_172_17_0_1.txt: creation epoch and src_ip in the name (pre-registry tokens)
+LEGACY_NAME_RE = re.compile(r'^honey(?:token)?_(\d+)_(\d+)_(\d+)_(\d+)_(\d+)\.txt$')
+
+
+def signed_key(key):
+    """dedup.event_key is an unsigned 64-bit int; SQLite integers are signed."""
+    if key is None or key < 1 << 63:
+        return key
+    return key - (1 << 64)
+
+
+class TokenRegistry:
+    """
+    - path: SQLite database file (created with its schema if missing)
+    - readonly: open an existing database for queries only
+    """
+
+    def __init__(self, path, readonly=False, timeout=30):
+        self.path = path
+        self.lock = threading.Lock()
+        if readonly:
+            self.conn = sqlite3.connect(f'file:{path}?mode=ro', uri=True, timeout=timeout,
+                                        check_same_thread=False)
+        else:
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            self.conn = sqlite3.connect(path, timeout=timeout, check_same_thread=False)
+            self.conn.execute('PRAGMA journal_mode=WAL')
+            self.conn.execute('PRAGMA synchronous=NORMAL')
+            self.conn.executescript(SCHEMA)
+            columns = {row[1] for row in self.conn.execute('PRAGMA table_info(tokens)')}
+            if 'event_key' not in columns:
+                self.conn.execute('ALTER TABLE tokens ADD COLUMN event_key INTEGER')
+            self.conn.execute(EVENT_KEY_INDEX)
+        self.conn.row_factory = sqlite3.Row
+
+    def add(self, name, host=None, src_ip=None, session=None, username=None, reason=None,
+            created_at=None, event_key=None):
+        self.add_many([(name, host, src_ip, session, username, reason, created_at, event_key)])
+
+    def add_many(self, rows):
+        """
+        Insert [(name, host, src_ip, session, username, reason, created_at[, event_key])]
+        as live tokens.
+        """
+        now = time.time()
+        rows = [(*row[:6], row[6] if row[6] is not None else now,
+                 signed_key(row[7]) if len(row) > 7 else None) for row in rows]
+        with self.lock, self.conn:
+            self.conn.executemany(
+                'INSERT OR REPLACE INTO tokens'
+                ' (name, host, src_ip, session, username, reason, created_at, event_key)'
+                ' VALUES (?, ?, ?, ?, ?, ?, ?, ?)', rows)
+
+    def record_trip(self, name, at=None, event_key=None):
+        """
+        Count a trip of token name. With the dedup key of the tripping event, a trip
+        already recorded for that event is ignored; returns whether it was counted.
+        """
+        at = time.time() if at is None else at
+        with self.lock, self.conn:
+            if event_key is not None:
+                cursor = self.conn.execute('INSERT OR IGNORE INTO trips (token, event_key, tripped_at)'
+                                           ' VALUES (?, ?, ?)', (name, signed_key(event_key), at))
+                if cursor.rowcount == 0:
+                    return False
+            self.conn.execute(
+                'UPDATE tokens SET trips = trips + 1, last_tripped_at = ?,'
+                ' first_tripped_at = COALESCE(first_tripped_at, ?) WHERE name = ?', (at, at, name))
+        return True
+
+    def set_state(self, names, state, at=None):
+        at = time.time() if at is None else at
+        with self.lock, self.conn:
+            self.conn.executemany('UPDATE tokens SET state = ?, state_changed_at = ? WHERE name = ?',
+                                  [(state, at, name) for name in names])
+
+    def query(self, sql, params=()):
+        with self.lock:
+            return [dict(row) for row in self.conn.execute(sql, params)]
+
+    def get(self, name):
+        rows = self.query('SELECT * FROM tokens WHERE name = ?', (name,))
+        return rows[0] if rows else None
+
+    def placed_for(self, event_key):
+        """Whether a token has already been placed for the event with this dedup key."""
+        with self.lock:
+            return self.conn.execute('SELECT 1 FROM tokens WHERE event_key = ? LIMIT 1',
+                                     (signed_key(event_key),)).fetchone() is not None
+
+    def names(self, state='live'):
+        with self.lock:
+            return [row[0] for row in self.conn.execute('SELECT name FROM tokens WHERE state = ?', (state,))]
+
+    def by_src_ip(self, src_ip):
+        return self.query('SELECT * FROM tokens WHERE src_ip = ? ORDER BY created_at', (src_ip,))
+
+    def by_host(self, host, state=None):
+        if state is None:
+            return self.query('SELECT * FROM tokens WHERE host = ? ORDER BY created_at', (host,))
+        return self.query('SELECT * FROM tokens WHERE host = ? AND state = ? ORDER BY created_at',
+                          (host, state))
+
+    def created_between(self, start, end):
+        return self.query('SELECT * FROM tokens WHERE created_at >= ? AND created_at < ?'
+                          ' ORDER BY created_at', (start, end))
+
+    def expired(self, cutoff, limit=None):
+        """Live tokens on a known host created before cutoff, oldest first."""
+        sql = ('SELECT * FROM tokens WHERE state = ? AND created_at < ? AND host IS NOT NULL'
+               ' ORDER BY created_at')
+        if limit:
+            sql += f' LIMIT {int(limit)}'
+        return self.query(sql, ('live', cutoff))
+
+    def live_counts_by_host(self):
+        with self.lock:
+            return dict(self.conn.execute(
+                'SELECT host, COUNT(*) FROM tokens WHERE state = ? AND host IS NOT NULL GROUP BY host',
+                ('live',)).fetchall())
+
+    def oldest_live(self, host, limit, since=None):
+        """The limit oldest live tokens on host, ignoring any created before since."""
+        return self.query('SELECT * FROM tokens WHERE host = ? AND state = ? AND created_at >= ?'
+                          ' ORDER BY created_at LIMIT ?',
+                          (host, 'live', since if since is not None else float('-inf'), int(limit)))
+
+    def count(self, state=None):
+        with self.lock:
+            if state is None:
+                return self.conn.execute('SELECT COUNT(*) FROM tokens').fetchone()[0]
+            return self.conn.execute('SELECT COUNT(*) FROM tokens WHERE state = ?', (state,)).fetchone()[0]
+
+    def counts_by_state(self):
+        with self.lock:
+            return dict(self.conn.execute('SELECT state, COUNT(*) FROM tokens GROUP BY state').fetchall())
+
+    def counts_by_src_ip(self, limit=None):
+        """[(src_ip, tokens, tripped tokens)] ordered by token count, highest first."""
+        sql = ('SELECT src_ip, COUNT(*), SUM(trips > 0) FROM tokens WHERE src_ip IS NOT NULL'
+               ' GROUP BY src_ip ORDER BY COUNT(*) DESC, src_ip')
+        if limit:
+            sql += f' LIMIT {int(limit)}'
+        with self.lock:
+            return [tuple(row) for row in self.conn.execute(sql)]
+
+    def count_tripped(self):
+        with self.lock:
+            return self.conn.execute('SELECT COUNT(*) FROM tokens WHERE trips > 0').fetchone()[0]
+
+    def tripped(self):
+        return self.query('SELECT * FROM tokens WHERE trips > 0 ORDER BY first_tripped_at')
+
+    def import_legacy(self, token_dir, host=None):
+        """Register tokens from a directory of legacy honey_<epoch>_<a>_<b>_<c>_<d>.txt files."""
+        rows = []
+        for fname in os.listdir(token_dir):
+            m = LEGACY_NAME_RE.match(fname)
+            if m:
+                rows.append((fname, host, '.'.join(m.groups()[1:]), None, None, 'imported',
+                             float(m.group(1))))
+        self.add_many(rows)
+        return len(rows)
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
@@ -4,11 +4,15 @@ Analyze REAL data from deception lab
 """
 import json
 import os
+import sys
 from datetime import datetime
 import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "deception_controller"))
+from token_registry import TokenRegistry
+
 print("="*70)
 print("ANALYZING REAL DECEPTION LAB DATA")
 print("="*70)
@@ -22,21 +26,24 @@ try:
 except:
     print("No attack results file found")
 
-# Count honeytokens
+# Count honeytokens and their sources from the token registry
 honeytoken_dir = "real_evidence/honeytokens"
-honeytokens = []
-if os.path.exists(honeytoken_dir):
-    honeytokens = [f for f in os.listdir(honeytoken_dir) if f.endswith('.txt')]
-    print(f"Found {len(honeytokens)} real honeytokens")
-
-# Parse IP addresses from honeytoken names
+token_db = os.environ.get("DECEPTION_TOKEN_DB")
+registry = None
+if token_db and os.path.exists(token_db):
+    registry = TokenRegistry(token_db, readonly=True)
+elif os.path.exists(honeytoken_dir):
+    # Tokens from before the registry encode their metadata in the filename; import them
+    # into an in-memory registry so no database is written into the source tree
+    registry = TokenRegistry(":memory:")
+    print(f"Imported {registry.import_legacy(honeytoken_dir)} legacy honeytokens from {honeytoken_dir}")
+honeytoken_count = 0
 ip_counts = {}
-for token in honeytokens:
-    # Extract IP from filename patterns like honey_1765344472_172_17_0_1.txt
-    parts = token.split('_')
-    if len(parts) >= 4:
-        ip = f"{parts[-4]}.{parts[-3]}.{parts[-2]}.{parts[-1].replace('.txt', '')}"
-        ip_counts[ip] = ip_counts.get(ip, 0) + 1
+if registry is not None:
+    honeytoken_count = registry.count()
+    ip_counts = {ip: placed for ip, placed, _ in registry.counts_by_src_ip()}
+    registry.close()
+    print(f"Found {honeytoken_count} real honeytokens")
 
 print(f"Attack sources detected: {len(ip_counts)}")
 
@@ -62,8 +69,8 @@ if attack_results:
         print(f"  {user}: {count} attempts")
 
 print(f"\nDeception Effectiveness:")
-print(f"  Honeytokens created: {len(honeytokens)}")
-print(f"  Detection ratio: {len(honeytokens)/max(len(attack_results), 1):.1%}")
+print(f"  Honeytokens created: {honeytoken_count}")
+print(f"  Detection ratio: {honeytoken_count/max(len(attack_results), 1):.1%}")
 print(f"  Average response time: <5 seconds (based on timestamps)")
 
 # Create visualizations
@@ -212,9 +219,9 @@ Most attempted usernames: {', '.join(sorted(usernames, key=usernames.get, revers
 
 REAL DECEPTION RESULTS:
 -----------------------
-Honeytokens created: {len(honeytokens)}
+Honeytokens created: {honeytoken_count}
 Attack sources detected: {len(ip_counts)}
-Detection rate: {(len(honeytokens)/max(len(attack_results), 1)*100 if attack_results else 0):.1f}%
+Detection rate: {(honeytoken_count/max(len(attack_results), 1)*100 if attack_results else 0):.1f}%
 Average response time: <5 seconds (observed from timestamp analysis)
 
 ATTACK SOURCES IDENTIFIED:
@@ -227,8 +234,8 @@ report += f"""
 SYSTEM VERIFICATION:
 --------------------
 Services deployed: Cowrie Honeypot, Deception Controller
-Containers running: {len(honeytokens) > 0 and 'Yes' or 'No'}
-Evidence collected: {len(honeytokens)} files
+Containers running: {honeytoken_count > 0 and 'Yes' or 'No'}
+Evidence collected: {honeytoken_count} files
 Data integrity: Complete audit trail maintained
 
 ETHICAL COMPLIANCE:
@@ -1,24 +1,45 @@
 #!/usr/bin/env python3
 """
 Simple scoring pipeline
-- Reads deception controller audit log and cowrie logs (or Elasticsearch export)
+- Reads deception controller audit log and cowrie logs (or Elasticsearch export); logs
+  of several sensors are merged into one stream ordered by timestamp
+- Queries the controller's token registry (SQLite) for token metadata
 - Computes:
   - Estimated mean time to detect (MTTD)
   - Counts of honeytoken placements and interactions
 
 Assumptions:
 - Cowrie JSON logs have 'src_ip' and 'timestamp' fields (ISO format)
-- Audit log is produced by deception_controller and contains 'timestamp' and 'src_ip'
+- Audit log is produced by deception_controller and contains 'timestamp' and 'src_ip';
+  only its 'place_honeytoken' records count as detections
 """
 
 import os
+import sys
 import json
 import statistics
 from datetime import datetime
 
+# Cowrie line parsing is shared with the controller
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "deception_controller"))
+from cowrie_parse import CowrieEvent, EventParser
+from log_segments import discover_segments, stream_lines
+from merge import merge_streams
+from token_registry import TokenRegistry
+
 BASE_DIR = os.path.expanduser(os.environ.get("DECEPTION_BASE", "~/deception_lab"))
 AUDIT_LOG = os.path.join(BASE_DIR, "logs", "deception_controller_audit.log")
 COWRIE_LOG_DIR = os.path.join(BASE_DIR, "logs", "cowrie")
+# Same sensor list and reorder window as the controller
+COWRIE_LOG_DIRS = [os.path.normpath(os.path.expanduser(d)) for d in os.environ.get(
+    "DECEPTION_COWRIE_LOG_DIRS", COWRIE_LOG_DIR).replace(",", os.pathsep).split(os.pathsep) if d]
+REORDER_WINDOW = float(os.environ.get("DECEPTION_REORDER_WINDOW", "2.0"))
+TOKEN_DB = os.environ.get("DECEPTION_TOKEN_DB", os.path.join(BASE_DIR, "logs", "token_registry.sqlite3"))
+# Fields compute_mttd and the summary read from Cowrie events; these fit in a
+# compact CowrieEvent record, so that is what the events are loaded as
+COWRIE_FIELDS = ("eventid", "src_ip", "session", "timestamp")
+# Compressed rotations decompressed concurrently while reading history
+DECOMPRESS_WORKERS = int(os.environ.get("DECEPTION_DECOMPRESS_WORKERS", "2"))
 
 def parse_audit(audit_path):
     events = []
@@ -32,25 +53,52 @@ def parse_audit(audit_path):
                 continue
     return events
 
-def parse_cowrie(cowrie_dir):
-    events = []
-    if not os.path.isdir(cowrie_dir):
-        return events
-    for fname in sorted(os.listdir(cowrie_dir)):
-        if not fname.endswith('.json'):
+def iter_cowrie(cowrie_dirs, eventids=None, fields=COWRIE_FIELDS, window=REORDER_WINDOW):
+    """
+    Yield Cowrie events from one or more sensor log directories, including rotated
+    and .gz segments, as one stream ordered by timestamp (heap k-way merge; only
+    events within window seconds of each sensor's newest are held in memory).
+    - eventids: only keep these eventids (None keeps all)
+    - fields: only keep these fields per event (None keeps the whole record);
+      when they are all CowrieEvent fields, events are compact CowrieEvent records
+      (timestamps as epoch seconds) instead of dicts
+    """
+    if isinstance(cowrie_dirs, str):
+        cowrie_dirs = [cowrie_dirs]
+    compact = fields is not None and set(fields) <= set(CowrieEvent.FIELDS)
+    streams = []
+    for cowrie_dir in cowrie_dirs:
+        if not os.path.isdir(cowrie_dir):
             continue
-        path = os.path.join(cowrie_dir, fname)
-        with open(path, 'r') as fh:
-            for line in fh:
-                try:
-                    e = json.loads(line.strip())
-                    events.append(e)
-                except Exception:
-                    continue
-    return events
+        parser = EventParser(eventids, fields, compact=compact)
+        paths = [seg.path for seg in discover_segments(cowrie_dir)]
+        events = map(parser, stream_lines(paths, DECOMPRESS_WORKERS))
+        streams.append(event for event in events if event is not None)
+    if streams:
+        yield from merge_streams(streams, window)
+
+def parse_cowrie(cowrie_dirs, eventids=None, fields=COWRIE_FIELDS):
+    """Load Cowrie events from cowrie_dirs into a list, oldest first (see iter_cowrie)."""
+    return list(iter_cowrie(cowrie_dirs, eventids, fields))
+
+def summarize_tokens(db_path, top=10):
+    """
+    Token placement and interaction counts from the registry, or None if there is none.
+    Returns {"by_state": {state: count}, "tripped": count, "sources": [(src_ip, tokens, tripped)]}.
+    """
+    if not os.path.exists(db_path):
+        return None
+    registry = TokenRegistry(db_path, readonly=True)
+    try:
+        return {"by_state": registry.counts_by_state(),
+                "tripped": registry.count_tripped(),
+                "sources": registry.counts_by_src_ip(top)}
+    finally:
+        registry.close()
 
 def compute_mttd(cowrie_events, detection_events):
-    # Match by src_ip; compute time diff between the first attacker event and first detection action
+    # Match by src_ip; compute time diff between the first attacker event and the first
+    # honeytoken placement for that IP
     times = []
     if not cowrie_events or not detection_events:
         return None
@@ -69,28 +117,56 @@ def compute_mttd(cowrie_events, detection_events):
                 first_by_ip.setdefault(ip, t_iso)
             except Exception:
                 continue
+    # Only token placements count as detections, and only the first one per IP;
+    # the audit log also holds trips, retirements, rotations and shed records
+    placed_by_ip = {}
     for d in detection_events:
         ip = d.get('src_ip')
         ts = d.get('timestamp')
-        if ip and ts and ip in first_by_ip:
-            try:
-                t1 = datetime.fromisoformat(first_by_ip[ip].replace("Z",""))
-                t2 = datetime.fromisoformat(ts.replace("Z",""))
-                delta = (t2 - t1).total_seconds()
-                times.append(delta)
-            except Exception:
-                continue
+        if d.get('action') != 'place_honeytoken' or not (ip and ts) or ip not in first_by_ip:
+            continue
+        try:
+            t2 = datetime.fromisoformat(ts.replace("Z",""))
+        except Exception:
+            continue
+        if ip not in placed_by_ip or t2 < placed_by_ip[ip]:
+            placed_by_ip[ip] = t2
+    for ip, t2 in placed_by_ip.items():
+        try:
+            t1 = datetime.fromisoformat(first_by_ip[ip].replace("Z",""))
+            times.append((t2 - t1).total_seconds())
+        except Exception:
+            continue
     if not times:
         return None
     return statistics.mean(times)
 
 def main():
     audit = parse_audit(AUDIT_LOG)
-    cowrie = parse_cowrie(COWRIE_LOG_DIR)
+    cowrie_count = 0
+
+    def counted(events):
+        nonlocal cowrie_count
+        for event in events:
+            cowrie_count += 1
+            yield event
+
+    cowrie = counted(iter_cowrie(COWRIE_LOG_DIRS))
     mttd = compute_mttd(cowrie, audit)
+    for _ in cowrie:  # count whatever compute_mttd did not need to read
+        pass
     print("Audit events:", len(audit))
-    print("Cowrie events:", len(cowrie))
+    print("Cowrie events:", cowrie_count)
     print("Estimated MTTD (seconds):", mttd)
+    tokens = summarize_tokens(TOKEN_DB)
+    if tokens is None:
+        print("Token registry not found:", TOKEN_DB)
+        return
+    print("Honeytokens placed:", sum(tokens["by_state"].values()),
+          ", ".join(f"{state} {n}" for state, n in sorted(tokens["by_state"].items())))
+    print("Honeytokens tripped:", tokens["tripped"])
+    for src_ip, placed, tripped in tokens["sources"]:
+        print(f"  {src_ip}: {placed} placed, {tripped} tripped")
 
 if __name__ == "__main__":
     main()
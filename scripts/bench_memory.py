@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+bench_memory.py
+
+Compare the memory held by a parsed Cowrie log kept in a list (as scoring does):
+- full: every field of every event (json.loads of each line)
+- projected: event dicts trimmed to the scoring fields (EventParser fields=...)
+- compact: cowrie_parse.CowrieEvent records (__slots__, interned eventid and
+  session, packed src_ip, epoch-float timestamp)
+
+Memory is measured with tracemalloc (allocations made while loading, minus the
+ones freed), so the numbers are per-process independent but loading is slower
+than without tracing.
+
+Usage example:
+  python3 scripts/bench_memory.py --lines 1000000
+  python3 scripts/bench_memory.py --log /opt/deception_lab/logs/cowrie/cowrie.json
+
+Without --log, a synthetic log is built from real_evidence/cowrie.json with a
+fresh session every 8 events, a new src_ip every 40 and increasing timestamps.
+"""
+import os
+import gc
+import sys
+import json
+import time
+import argparse
+import tempfile
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(ROOT, "deception_controller"))
+sys.path.insert(0, os.path.join(ROOT, "scoring"))
+
+from cowrie_parse import EventParser, loads, parse_file  # noqa: E402
+from scoring import COWRIE_FIELDS  # noqa: E402
+
+
+def build_log(path, lines):
+    with open(os.path.join(ROOT, "real_evidence", "cowrie.json"), "rb") as fh:
+        sample = [json.loads(l) for l in fh.read().splitlines() if l.strip()]
+    start = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    with open(path, "w") as out:
+        for i in range(lines):
+            event = dict(sample[i % len(sample)])
+            source = i // 40
+            event["session"] = f"{i // 8:012x}"
+            event["src_ip"] = f"10.{source >> 16 & 255}.{source >> 8 & 255}.{source & 255}"
+            event["timestamp"] = (start + timedelta(milliseconds=10 * i)).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+            out.write(json.dumps(event) + "\n")
+
+
+def full(path):
+    with open(path, "rb") as fh:
+        return [loads(line) for line in fh if line.strip()]
+
+
+def measure(name, load):
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    events = load()
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    held, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{name:<10} {held / 1e6:>9.1f} MB  {held / max(1, len(events)):>7.0f} B/event  "
+          f"{len(events):>9} events  {elapsed:7.2f} s load")
+    del events
+    return held
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--log", help="existing Cowrie JSON log to load")
+    ap.add_argument("--lines", type=int, default=1000000, help="synthetic log size when --log is not given")
+    args = ap.parse_args()
+
+    tmp = None
+    path = args.log
+    if not path:
+        tmp = tempfile.NamedTemporaryFile(prefix="cowrie_bench_", suffix=".json", delete=False)
+        tmp.close()
+        path = tmp.name
+        build_log(path, args.lines)
+    try:
+        print(f"{path}: {os.path.getsize(path) / 1e6:.1f} MB")
+        base = measure("full", lambda: full(path))
+        projected = measure("projected", lambda: list(parse_file(path, EventParser(fields=COWRIE_FIELDS))))
+        compact = measure("compact", lambda: list(parse_file(path, EventParser(compact=True))))
+        print(f"reduction: compact uses {compact / base:.0%} of full, {compact / projected:.0%} of projected")
+    finally:
+        if tmp:
+            os.unlink(path)
+
+
+if __name__ == "__main__":
+    main()
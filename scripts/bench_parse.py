@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+bench_parse.py
+
+Compare Cowrie log parsing throughput (lines/second):
+- baseline: text-mode read + json.loads of every line (the original scan_cowrie_logs)
+- fast: cowrie_parse.EventParser (orjson if installed) keeping the controller fields
+- fast+filter: as above, with the controller's default eventid prefilter
+
+Usage example:
+  python3 scripts/bench_parse.py --lines 1000000
+  python3 scripts/bench_parse.py --log /opt/deception_lab/logs/cowrie/cowrie.json
+
+Without --log, a synthetic log is built by repeating real_evidence/cowrie.json.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(ROOT, "deception_controller"))
+
+import cowrie_parse  # noqa: E402
+from cowrie_parse import CONTROLLER_EVENTIDS, CONTROLLER_FIELDS, EventParser, parse_file  # noqa: E402
+
+
+def build_log(path, lines):
+    with open(os.path.join(ROOT, "real_evidence", "cowrie.json"), "rb") as fh:
+        sample = [l for l in fh.read().splitlines(True) if l.strip()]
+    with open(path, "wb") as out:
+        for i in range(lines):
+            out.write(sample[i % len(sample)])
+
+
+def baseline(path):
+    count = 0
+    with open(path, "r") as fh:
+        for line in fh:
+            try:
+                json.loads(line.strip())
+                count += 1
+            except json.JSONDecodeError:
+                continue
+    return count
+
+
+def timed(name, fn, total_lines):
+    start = time.perf_counter()
+    events = fn()
+    elapsed = time.perf_counter() - start
+    print(f"{name:<12} {total_lines / elapsed:>12,.0f} lines/s  {elapsed:7.2f} s  {events:>9} events")
+    return elapsed
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--log", help="existing Cowrie JSON log to parse")
+    ap.add_argument("--lines", type=int, default=1000000, help="synthetic log size when --log is not given")
+    args = ap.parse_args()
+
+    tmp = None
+    path = args.log
+    if not path:
+        tmp = tempfile.NamedTemporaryFile(prefix="cowrie_bench_", suffix=".json", delete=False)
+        tmp.close()
+        path = tmp.name
+        build_log(path, args.lines)
+    try:
+        with open(path, "rb") as fh:
+            total = sum(1 for _ in fh)
+        print(f"{path}: {total} lines, {os.path.getsize(path) / 1e6:.1f} MB, "
+              f"decoder: {'orjson' if cowrie_parse.orjson else 'json'}")
+        base = timed("baseline", lambda: baseline(path), total)
+        fast = timed("fast", lambda: sum(1 for _ in parse_file(
+            path, EventParser(fields=CONTROLLER_FIELDS))), total)
+        filt = timed("fast+filter", lambda: sum(1 for _ in parse_file(
+            path, EventParser(CONTROLLER_EVENTIDS, CONTROLLER_FIELDS))), total)
+        print(f"speed-up: fast {base / fast:.1f}x, fast+filter {base / filt:.1f}x")
+    finally:
+        if tmp:
+            os.unlink(path)
+
+
+if __name__ == "__main__":
+    main()
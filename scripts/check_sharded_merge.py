@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+check_sharded_merge.py
+
+Regression check for sharded.ShardedController: whatever order the shard
+workers acknowledge their chunks in, the collector must hand audit records to
+audit() in ingest order, each exactly once, and a checkpoint may only be saved
+once every event routed before it has been acknowledged and audited.
+
+Workers here are stand-ins that sleep a random time per chunk (so shards
+overtake each other) and return one audit record for two events in three.
+
+Usage example:
+  python3 scripts/check_sharded_merge.py [--events N] [--shards K]
+
+Exits non-zero (AssertionError) if records are lost, duplicated or reordered.
+"""
+import os
+import sys
+import time
+import random
+import argparse
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(ROOT, "deception_controller"))
+
+from sharded import CHECKPOINT, ShardedController  # noqa: E402
+
+
+class Done(Exception):
+    pass
+
+
+def worker(shard, inbox, outbox):
+    rng = random.Random(shard)
+    for chunk in iter(inbox.get, None):
+        if chunk == CHECKPOINT:
+            continue
+        time.sleep(rng.uniform(0, 0.01) * (shard + 1))
+        audits = [(seq, {"seq": seq, "shard": shard}) for seq, event in chunk if event["n"] % 3]
+        outbox.put((shard, chunk[-1][0], audits, None))
+    outbox.put((shard, None, [], None))
+
+
+class Checkpoint:
+    """Due every few scans; save() records how far ingest and audit had got."""
+
+    def __init__(self, routed, audited, every=4):
+        self.routed = routed
+        self.audited = audited
+        self.every = every
+        self.calls = 0
+        self.saves = []
+
+    def due(self):
+        self.calls += 1
+        return self.calls % self.every == 0
+
+    def save(self):
+        self.saves.append((self.routed[0], len(self.audited)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("--events", type=int, default=20000)
+    parser.add_argument("--shards", type=int, default=4)
+    parser.add_argument("--chunk", type=int, default=50)
+    args = parser.parse_args()
+
+    rng = random.Random(786)
+    events = [{"n": n, "src_ip": f"10.0.{rng.randrange(256)}.{rng.randrange(256)}"}
+              for n in range(1, args.events + 1)]
+    batches = [events[i:i + 997] for i in range(0, len(events), 997)]
+    routed = [0]
+    audited = []
+
+    def scan(flush=False):
+        if batches:
+            batch = batches.pop(0)
+            routed[0] += len(batch)
+            yield from batch
+
+    def wait():
+        if not batches:
+            raise Done()
+
+    def audit(entries):
+        audited.extend(entry["seq"] for entry in entries)
+
+    controller = ShardedController(worker, args.shards, chunk_size=args.chunk, queue_chunks=4)
+    checkpoint = Checkpoint(routed, audited)
+    start = time.perf_counter()
+    try:
+        controller.run(scan, wait, audit, checkpoint=checkpoint)
+    except Done:
+        pass
+    elapsed = time.perf_counter() - start
+
+    expected = [n for n in range(1, args.events + 1) if n % 3]
+    assert len(audited) == len(set(audited)), "audit records delivered twice"
+    assert audited == sorted(audited), "audit records released out of ingest order"
+    assert audited == expected, f"{len(expected) - len(audited)} audit records lost"
+    assert len(checkpoint.saves) >= 2, "no periodic checkpoint was taken"
+    for routed_at, audited_at in checkpoint.saves:
+        want = sum(1 for n in range(1, routed_at + 1) if n % 3)
+        assert audited_at == want, f"checkpoint after {routed_at} events saw {audited_at}/{want} audits"
+    print(f"OK: {len(audited)} audit records from {args.shards} shards in ingest order, "
+          f"{len(checkpoint.saves)} settled checkpoints, {elapsed:.2f}s")
+
+
+if __name__ == "__main__":
+    main()